@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+提取器热点模块的AOT编译脚本（可选）
+
+使用mypyc将 core/extractors/ 下的纯Python热点模块编译为C扩展，
+字符串密集的验证/清理循环（_validate_and_enhance、_clean_amount、
+get_completeness_score等）可获得约2-5x加速。
+
+用法：
+    pip install mypy
+    python build.py
+
+编译产物（.so/.pyd）就地生成在源文件旁，Python导入时自动优先加载；
+删除产物即回退到纯Python实现，调用方无需任何改动。
+"""
+
+import sys
+
+# 编译对象：批处理内循环涉及的提取器模块
+MODULES = [
+    "core/extractors/base.py",
+    "core/extractors/hybrid_extractor.py",
+    "core/extractors/llm_extractor.py",
+]
+
+
+def main():
+    try:
+        from setuptools import setup
+        from mypyc.build import mypycify
+    except ImportError:
+        print("请安装 mypy: pip install mypy")
+        return 1
+
+    setup(
+        name="invoice_extractors_compiled",
+        ext_modules=mypycify(MODULES),
+        script_args=["build_ext", "--inplace"],
+    )
+    print("编译完成，已就地生成C扩展")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
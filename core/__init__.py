@@ -1,16 +1,34 @@
 # -*- coding: utf-8 -*-
 """
 发票管理系统V2 - 核心模块
+
+顶层名称采用PEP 562惰性导入，import core 本身不加载任何LLM依赖
 """
 
-from .config import settings
-from .llm import get_llm, LLMFactory
-from .extractors import get_extractor, InvoiceInfo
+import importlib
+
+# 名称 -> 所在子模块 的惰性导入表
+_LAZY_IMPORTS = {
+    "settings": ".config.settings",
+    "get_llm": ".llm.factory",
+    "LLMFactory": ".llm.factory",
+    "get_extractor": ".extractors",
+    "InvoiceInfo": ".extractors",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
 
-__all__ = [
-    "settings",
-    "get_llm",
-    "LLMFactory",
-    "get_extractor",
-    "InvoiceInfo",
-]
+def __getattr__(name):
+    """惰性解析模块属性（PEP 562）"""
+    try:
+        module_path = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if name == "settings":
+        value = importlib.import_module(module_path, __name__)
+    else:
+        module = importlib.import_module(module_path, __name__)
+        value = getattr(module, name)
+    globals()[name] = value
+    return value
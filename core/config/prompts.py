@@ -6,12 +6,10 @@
 """
 
 # 发票信息提取主Prompt
-INVOICE_EXTRACTION_PROMPT = """你是一位专业的发票信息提取专家。请从以下发票内容中提取关键信息。
-
-## 发票内容
-```
-{invoice_text}
-```
+# 静态指令统一放在可变内容之前：所有发票请求因此共享一段字节一致的
+# 长前缀，OpenAI/DeepSeek等提供商的提示缓存按请求token前缀匹配，
+# 前缀部分的prefill只需计算一次即可跨请求复用
+INVOICE_EXTRACTION_PROMPT = """你是一位专业的发票信息提取专家。请从发票内容中提取关键信息。
 
 ## 请严格按照以下JSON格式返回提取结果：
 
@@ -41,7 +39,49 @@ INVOICE_EXTRACTION_PROMPT = """你是一位专业的发票信息提取专家。
 6. 如果备注栏包含"代开企业名称"、"代开人"等信息，请提取真实销售方：
     - 优先提取备注中的代开企业名称作为销售方
     - 如果代开信息格式为"代开人+业务描述"（如"谢强、门润搭设与拆除劳务"），
-    仅提取代开人姓名或企业名称作为销售方"""
+    仅提取代开人姓名或企业名称作为销售方
+
+## 发票内容
+```
+{invoice_text}
+```"""
+
+
+# 批量提取Prompt（一次请求处理多张发票，摊薄请求开销）
+# 同样把静态指令前置、可变的张数和发票内容后置，保持前缀字节一致
+INVOICE_BATCH_EXTRACTION_PROMPT = """你是一位专业的发票信息提取专家。下面的发票内容以 ===INVOICE N=== 行分隔。
+
+## 请对每张发票提取关键信息，严格按输入顺序返回与发票数量等长的JSON数组：
+
+```json
+[
+    {{
+        "发票号码": "20位数字或8位数字，如无法识别填null",
+        "发票类型": "增值税电子普通发票/增值税专用发票/增值税普通发票/机动车销售统一发票/火车票/飞机行程单/出租车票/其他",
+        "开票日期": "YYYY-MM-DD格式，如无法识别填null",
+        "购买方名称": "完整公司名称",
+        "购买方纳税人识别号": "15-20位统一社会信用代码/纳税人识别号",
+        "销售方名称": "完整公司名称",
+        "销售方纳税人识别号": "15-20位统一社会信用代码/纳税人识别号",
+        "金额": "不含税金额数字",
+        "税额": "税额数字",
+        "价税合计": "含税总金额数字",
+        "发票内容": "商品或服务名称",
+        "备注": "发票备注信息，如无则填null"
+    }}
+]
+```
+
+## 重要提示：
+1. 数组元素顺序必须与输入发票顺序一致，每张发票对应一个JSON对象
+2. 发票号码通常是20位（电子发票）或8位（纸质发票）纯数字
+3. 金额只保留数字，不含货币符号￥或¥
+4. 无法识别的字段填null，不要遗漏任何一张发票
+5. 严格返回JSON数组格式，不要添加其他解释文字
+
+## 以下共{count}张发票：
+
+{invoices}"""
 
 
 # 视觉识别Prompt（用于图片发票）
@@ -90,9 +130,7 @@ INVOICE_VISION_PROMPT = """请仔细观察这张发票图片，提取以下关
 
 
 # 发票类型识别Prompt（轻量级）
-INVOICE_TYPE_PROMPT = """请识别以下发票内容属于哪种发票类型：
-
-内容：{invoice_text}
+INVOICE_TYPE_PROMPT = """请识别发票内容属于哪种发票类型。
 
 可选类型：
 - 增值税电子普通发票
@@ -108,12 +146,67 @@ INVOICE_TYPE_PROMPT = """请识别以下发票内容属于哪种发票类型：
 - 餐饮发票
 - 其他
 
-请只返回发票类型名称，不要添加其他内容。"""
+请只返回发票类型名称，不要添加其他内容。
+
+内容：{invoice_text}"""
+
+
+# 发票字段的JSON Schema（供支持结构化输出的提供商约束响应，
+# 保证返回合法JSON，免去围栏剥离和格式修复）
+_NULLABLE_STRING = {"type": ["string", "null"]}
+
+_INVOICE_FIELDS = (
+    "发票号码", "发票类型", "开票日期",
+    "购买方名称", "购买方纳税人识别号",
+    "销售方名称", "销售方纳税人识别号",
+    "金额", "税额", "价税合计", "发票内容", "备注",
+)
+
+INVOICE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {name: _NULLABLE_STRING for name in _INVOICE_FIELDS},
+    "required": list(_INVOICE_FIELDS),
+    "additionalProperties": False,
+}
+
+# 批量提取返回的是发票对象数组
+INVOICE_BATCH_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": INVOICE_RESPONSE_SCHEMA,
+}
+
+
+# 模板在导入时按占位符预切分并还原转义花括号：str.format每次调用
+# 都要整段扫描模板，预切分后热路径上只剩一次字符串拼接
+def _split_template(template: str, placeholder: str = "{invoice_text}"):
+    return tuple(
+        part.replace("{{", "{").replace("}}", "}")
+        for part in template.split(placeholder)
+    )
+
+
+_EXTRACTION_PREFIX, _EXTRACTION_SUFFIX = _split_template(INVOICE_EXTRACTION_PROMPT)
+_TYPE_PREFIX, _TYPE_SUFFIX = _split_template(INVOICE_TYPE_PROMPT)
+
+# 提取Prompt的静态前缀（完整指令部分），供Gemini适配器创建显式的
+# CachedContent上下文缓存时复用同一份字节串
+EXTRACTION_PROMPT_PREFIX = _EXTRACTION_PREFIX
 
 
 def build_extraction_prompt(invoice_text: str) -> str:
     """构建发票信息提取Prompt"""
-    return INVOICE_EXTRACTION_PROMPT.format(invoice_text=invoice_text)
+    return f"{_EXTRACTION_PREFIX}{invoice_text}{_EXTRACTION_SUFFIX}"
+
+
+def build_batch_extraction_prompt(invoice_texts: list) -> str:
+    """构建批量发票信息提取Prompt"""
+    invoices = "\n\n".join(
+        f"===INVOICE {i}===\n{text}"
+        for i, text in enumerate(invoice_texts, 1)
+    )
+    return INVOICE_BATCH_EXTRACTION_PROMPT.format(
+        count=len(invoice_texts), invoices=invoices
+    )
 
 
 def build_vision_prompt() -> str:
@@ -123,4 +216,4 @@ def build_vision_prompt() -> str:
 
 def build_type_prompt(invoice_text: str) -> str:
     """构建类型识别Prompt"""
-    return INVOICE_TYPE_PROMPT.format(invoice_text=invoice_text[:500])  # 限制长度
+    return f"{_TYPE_PREFIX}{invoice_text[:500]}{_TYPE_SUFFIX}"  # 限制长度
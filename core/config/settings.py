@@ -20,26 +20,34 @@ def _load_dotenv():
     ]
     
     for env_path in env_paths:
-        if env_path.exists():
-            try:
-                with open(env_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        # 跳过注释和空行
-                        if not line or line.startswith('#'):
-                            continue
-                        # 解析 KEY=VALUE
-                        if '=' in line:
-                            key, _, value = line.partition('=')
-                            key = key.strip()
-                            value = value.strip()
-                            # 不覆盖已存在的环境变量
-                            if key and key not in os.environ:
-                                os.environ[key] = value
-                print(f"已加载配置文件: {env_path}")
-                return True
-            except Exception as e:
-                print(f"加载 .env 失败: {e}")
+        # 先判断存在性，避免无 .env 时的打开开销
+        if not env_path.exists():
+            continue
+        try:
+            # .env 通常只有几KB，整体读入后一次性解析
+            data = env_path.read_text(encoding='utf-8')
+        except Exception as e:
+            print(f"加载 .env 失败: {e}")
+            continue
+
+        items = {}
+        for line in data.splitlines():
+            line = line.strip()
+            # 跳过注释、空行和无效行
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            # 解析 KEY=VALUE
+            key, _, value = line.partition('=')
+            key = key.strip()
+            if key:
+                items[key] = value.strip()
+
+        # 一次性写入环境变量，不覆盖已存在的值
+        os.environ.update(
+            {k: v for k, v in items.items() if k not in os.environ}
+        )
+        print(f"已加载配置文件: {env_path}")
+        return True
     return False
 
 # 在模块导入时自动加载
@@ -63,6 +71,22 @@ DEEPSEEK_API_KEY: str = os.environ.get("DEEPSEEK_API_KEY", "")
 # API超时设置（秒）
 LLM_TIMEOUT: int = 30
 
+# 响应缓存后端: sqlite(默认，跨运行持久化) / memory / none
+LLM_CACHE_BACKEND: str = os.environ.get("LLM_CACHE_BACKEND", "sqlite")
+
+# 缓存有效期（秒），0表示永不过期（仅sqlite后端生效）
+LLM_CACHE_TTL: int = int(os.environ.get("LLM_CACHE_TTL", "0"))
+
+# 发票模板缓存：同一销售方的同版式发票复用稳定字段，只重提号码/日期/金额
+TEMPLATE_CACHE_ENABLED: bool = os.environ.get("TEMPLATE_CACHE_ENABLED", "1") == "1"
+
+# Ollama模型驻留时长（-1为常驻）：批处理期间避免每次请求后卸载数GB权重再重载
+OLLAMA_KEEP_ALIVE: str = os.environ.get("OLLAMA_KEEP_ALIVE", "-1")
+
+# 提示前缀缓存：静态指令作为字节一致的长前缀前置，云端提供商可跨请求
+# 复用该前缀的prefill（OpenAI/DeepSeek自动前缀缓存，Gemini显式CachedContent）
+PROMPT_CACHE_ENABLED: bool = os.environ.get("PROMPT_CACHE_ENABLED", "1") == "1"
+
 # 最大重试次数
 LLM_MAX_RETRIES: int = 3
 
@@ -79,11 +103,20 @@ OLLAMA_MODEL: str = os.environ.get("OLLAMA_MODEL", "qwen2.5:7b")
 
 DEEPSEEK_BASE_URL: str = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
 
+# ===========================================
+# 本地模型配置（llama-cpp-python进程内推理）
+# ===========================================
+
+# GGUF模型文件路径（推荐Q4_K_M量化的小模型，如Qwen2.5-0.5B）
+LOCAL_MODEL_PATH: str = os.environ.get(
+    "LOCAL_MODEL_PATH", "models/qwen2.5-0.5b-instruct-q4_k_m.gguf"
+)
+
 # ===========================================
 # 提取模式配置
 # ===========================================
 
-# 提取模式: llm / vision / hybrid / regex_fallback
+# 提取模式: llm / vision / hybrid / local / regex_fallback
 EXTRACTION_MODE: str = os.environ.get("EXTRACTION_MODE", "hybrid")
 
 # 启用正则表达式兜底验证
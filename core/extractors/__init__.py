@@ -3,37 +3,66 @@
 提取器模块
 
 提供多种发票信息提取器
+
+采用PEP 562惰性导入：提取器模块（及其背后的LLM适配器、PyMuPDF等）
+只在首次访问时加载，regex_fallback 模式下完全不触碰LLM依赖
 """
 
-from .base import BaseExtractor, InvoiceInfo
-from .llm_extractor import LLMInvoiceExtractor
-from .hybrid_extractor import HybridExtractor, RegexFallbackExtractor
-from .vision_extractor import VisionExtractor
+import importlib
+
+# 基础类型很轻量，保持即时导入
+from .base import BaseExtractor, InvoiceInfo, batch_completeness
+
+# 名称 -> 所在子模块 的惰性导入表
+_LAZY_IMPORTS = {
+    "LLMInvoiceExtractor": ".llm_extractor",
+    "HybridExtractor": ".hybrid_extractor",
+    "RegexFallbackExtractor": ".hybrid_extractor",
+    "TemplateCache": ".template_cache",
+    "VisionExtractor": ".vision_extractor",
+    "LocalExtractor": ".local_extractor",
+}
 
 __all__ = [
     "BaseExtractor",
     "InvoiceInfo",
+    "batch_completeness",
     "LLMInvoiceExtractor",
     "HybridExtractor",
     "RegexFallbackExtractor",
     "VisionExtractor",
+    "LocalExtractor",
 ]
 
 
+def __getattr__(name):
+    """惰性解析模块属性（PEP 562）"""
+    try:
+        module_path = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(module_path, __name__)
+    value = getattr(module, name)
+    # 缓存到模块命名空间，后续访问不再经过__getattr__
+    globals()[name] = value
+    return value
+
+
 def get_extractor(mode: str = "hybrid", adapter=None, text_adapter=None, vision_adapter=None):
     """
     获取提取器实例
-    
+
     Args:
         mode: 提取模式
             - "llm": 纯LLM提取
             - "hybrid": 混合模式（推荐）
             - "vision": 视觉识别
+            - "local": 本地模型（进程内推理）
             - "regex_fallback": 正则兜底
         adapter: LLM适配器实例（兼容旧接口）
         text_adapter: 文本LLM适配器（用于处理PDF/OFD/XML的文本）
         vision_adapter: 视觉LLM适配器（用于处理图片）
-        
+
     Returns:
         对应的提取器实例
     """
@@ -42,14 +71,22 @@ def get_extractor(mode: str = "hybrid", adapter=None, text_adapter=None, vision_
         text_adapter = adapter
     if adapter is not None and vision_adapter is None:
         vision_adapter = adapter
-    
+
+    # 按模式惰性导入对应提取器
     if mode == "llm":
+        from .llm_extractor import LLMInvoiceExtractor
         return LLMInvoiceExtractor(text_adapter, vision_adapter)
     elif mode == "hybrid":
+        from .hybrid_extractor import HybridExtractor
         return HybridExtractor(text_adapter, vision_adapter)
     elif mode == "vision":
+        from .vision_extractor import VisionExtractor
         return VisionExtractor(vision_adapter)
+    elif mode == "local":
+        from .local_extractor import LocalExtractor
+        return LocalExtractor(vision_adapter=vision_adapter)
     elif mode == "regex_fallback":
+        from .hybrid_extractor import RegexFallbackExtractor
         return RegexFallbackExtractor()
     else:
         raise ValueError(f"不支持的提取模式: {mode}")
@@ -7,18 +7,77 @@
 
 import re
 import logging
-from typing import Optional
+import unicodedata
+from typing import List, Optional
 
 from .base import BaseExtractor, InvoiceInfo
 from .llm_extractor import LLMInvoiceExtractor
+from .template_cache import TemplateCache
 from ..llm.base_adapter import BaseLLMAdapter
+from ..config.settings import TEMPLATE_CACHE_ENABLED
 
 logger = logging.getLogger(__name__)
 
+# 可选的DFA正则引擎（google-re2）：对长OCR文本的字符类扫描为严格O(n)，
+# 无回溯风险；未安装时回退到标准库re，API兼容无需改动调用点
+try:
+    import re2 as _re2
+except ImportError:
+    _re2 = re
+
+# 可选的Aho-Corasick自动机（pyahocorasick）：兜底提取的标签关键词
+# 一趟Trie扫描全部定位，命中处再做锚定正则匹配，取代逐模式的全文
+# search/findall；未安装时回退原有逐模式扫描，提取结果不受影响
+try:
+    import ahocorasick as _ahocorasick
+except ImportError:
+    _ahocorasick = None
+
+# 金额清理用的删除表：货币符号、千分位逗号和空白字符
+_AMOUNT_STRIP = str.maketrans("", "", "￥¥,， \t\n\r\x0b\x0c")
+
+# 扫描前先做NFKC归一化：全角标点（：￥１２３等）折叠为半角后，
+# 模式体只需ASCII分支（更小的NFA，每字节更少的字符类判断），
+# 且全ASCII片段让str退化为1字节/字符表示，扫描的内存流量减半
+_NFKC = unicodedata.normalize
+
+# 字段验证用的分类模式集（配合fullmatch使用无需锚点）：发票号码与
+# 税号两组模式合并为一个命名分组选择结构，单次C层调用既判合法性
+# 又给出字段类别。inv: 8位纸质或20位电子发票号；tax: 18位统一社会
+# 信用代码或15位旧格式（[^\W_]{15}等价于isalnum）。两组形状互斥
+# （8/20位纯数字 vs 18位带校验字符集/15位字母数字），先验inv不会
+# 吞掉合法税号
+_VALIDATE_SET = re.compile(
+    r'(?P<inv>\d{8}|\d{20})'
+    r'|(?P<tax>[0-9A-HJ-NPQRTUWXY]{2}[0-9]{6}[0-9A-HJ-NPQRTUWXY]{10}|[^\W_]{15})'
+)
+
+
+def _classify(value: str) -> Optional[str]:
+    """返回字符串匹配的字段类别（'inv'/'tax'），不合法时返回None"""
+    match = _VALIDATE_SET.fullmatch(value)
+    return match.lastgroup if match else None
+
 
 class HybridExtractor(BaseExtractor):
     """混合提取器：LLM + 正则验证/兜底"""
-    
+
+    # 类级融合正则：发票号码/税号/金额四个模式合并为一个命名分组选择结构，
+    # 一次finditer即完成全文扫描（四趟线性扫描降为一趟），按lastgroup分发；
+    # 8位号码后置(?!\d)否定前瞻，避免吞掉20位电子发票号的前8位。
+    # 输入经NFKC归一化，模式体只保留半角分支；边界用字母数字环视而非\b
+    # （\b把汉字也算作单词字符，紧邻中文的数字串会被误判为无边界）
+    # 量词全部有界（\s{0,4}、\d{1,12}(?:\.\d{1,2})?），病态文本上
+    # 每个位置的回溯状态空间为常数，不会退化为逐字符回溯模拟。
+    # 注意：环视((?<!...)/(?!...))是RE2不支持的perl算子，该模式
+    # 必须用标准库re编译——装有google-re2时走_re2会在导入期报错
+    _RX_ALL = re.compile(
+        r'(?P<inv20>(?<![0-9A-Za-z])24[4-8]\d{17}(?![0-9A-Za-z]))'
+        r'|发票号码:\s{0,4}(?P<inv8>\d{8})(?!\d)'
+        r'|(?P<taxid>(?<![0-9A-Za-z])[0-9A-HJ-NPQRTUWXY]{2}[0-9]{6}[0-9A-HJ-NPQRTUWXY]{10}(?![0-9A-Za-z]))'
+        r'|[价合][税计][:¥]?\s{0,4}(?P<amt>\d{1,12}(?:\.\d{1,2})?)'
+    )
+
     def __init__(
         self, 
         text_adapter: Optional[BaseLLMAdapter] = None,
@@ -32,14 +91,9 @@ class HybridExtractor(BaseExtractor):
             vision_adapter: 视觉LLM适配器（用于图片识别）
         """
         self.llm_extractor = LLMInvoiceExtractor(text_adapter, vision_adapter)
-        
-        # 预编译正则表达式
-        self._patterns = {
-            'invoice_number_20': re.compile(r'\b(24[4-8]\d{17})\b'),
-            'invoice_number_8': re.compile(r'发票号码[：:]\s*(\d{8})'),
-            'tax_id': re.compile(r'\b([0-9A-HJ-NPQRTUWXY]{2}[0-9]{6}[0-9A-HJ-NPQRTUWXY]{10})\b'),
-            'amount': re.compile(r'[价合][税计][：:￥¥]?\s*(\d+\.?\d*)'),
-        }
+
+        # 模板缓存：同版式发票跳过LLM调用，只正则重提可变字段
+        self._template_cache = TemplateCache() if TEMPLATE_CACHE_ENABLED else None
     
     def extract(self, text: str, file_path: Optional[str] = None) -> InvoiceInfo:
         """
@@ -58,7 +112,13 @@ class HybridExtractor(BaseExtractor):
             提取的发票信息
         """
         logger.info(f"使用混合提取器: {file_path or '文本输入'}")
-        
+
+        # 步骤0: 模板缓存命中时跳过LLM，只做正则重提+验证
+        if self._template_cache is not None:
+            cached = self._template_cache.lookup(text)
+            if cached is not None:
+                return self._validate_and_enhance(cached, text)
+
         # 步骤1: LLM提取
         info = self.llm_extractor.extract(text, file_path)
         
@@ -67,17 +127,57 @@ class HybridExtractor(BaseExtractor):
         
         # 更新提取方式
         info.提取方式 = "hybrid"
-        
+
+        # 高质量结果存为模板，同销售方的后续发票免LLM
+        if self._template_cache is not None:
+            self._template_cache.store(text, info)
+
         logger.info(f"混合提取完成，最终置信度: {info.置信度:.2f}")
         return info
     
+    def extract_batch(self, texts: List[str]) -> List[InvoiceInfo]:
+        """
+        批量提取多张发票（混合策略）
+
+        LLM批量提取后，逐张执行正则验证和补全。
+
+        Args:
+            texts: 发票文本列表
+
+        Returns:
+            与输入顺序对应的发票信息列表
+        """
+        # 先过模板缓存，只把未命中的文本送入LLM批量提取
+        infos: List[Optional[InvoiceInfo]] = [None] * len(texts)
+        miss_indexes = []
+        if self._template_cache is not None:
+            for i, text in enumerate(texts):
+                cached = self._template_cache.lookup(text)
+                if cached is not None:
+                    infos[i] = self._validate_and_enhance(cached, text)
+                else:
+                    miss_indexes.append(i)
+        else:
+            miss_indexes = list(range(len(texts)))
+
+        if miss_indexes:
+            llm_infos = self.llm_extractor.extract_batch([texts[i] for i in miss_indexes])
+            for i, info in zip(miss_indexes, llm_infos):
+                self._validate_and_enhance(info, texts[i])
+                info.提取方式 = "hybrid"
+                if self._template_cache is not None:
+                    self._template_cache.store(texts[i], info)
+                infos[i] = info
+
+        return infos
+
     def extract_from_image(self, image_path: str) -> InvoiceInfo:
         """
         从图片中提取发票信息
-        
+
         Args:
             image_path: 图片文件路径
-            
+
         Returns:
             提取的发票信息
         """
@@ -100,29 +200,36 @@ class HybridExtractor(BaseExtractor):
         Returns:
             验证/增强后的信息
         """
+        # 惰性单趟扫描：任一字段需要正则候选时才扫全文，且最多只扫一次
+        scanned = None
+
         # 验证/补全发票号码
         if not info.发票号码:
-            info.发票号码 = self._extract_invoice_number(text)
+            scanned = self._scan_fields(text)
+            info.发票号码 = scanned['invoice_number']
         elif not self._validate_invoice_number(info.发票号码):
             # LLM提取的发票号码格式不对，尝试正则提取
-            regex_number = self._extract_invoice_number(text)
+            scanned = self._scan_fields(text)
+            regex_number = scanned['invoice_number']
             if regex_number:
                 logger.info(f"LLM发票号码格式异常，使用正则结果: {regex_number}")
                 info.发票号码 = regex_number
-        
-        # 验证/补全纳税人识别号
+
+        # 验证/补全纳税人识别号（购买方/销售方共享扫描结果）
         if not info.购买方纳税人识别号:
-            tax_ids = self._extract_tax_ids(text)
-            if len(tax_ids) >= 1:
-                info.购买方纳税人识别号 = tax_ids[0]
+            if scanned is None:
+                scanned = self._scan_fields(text)
+            if len(scanned['tax_ids']) >= 1:
+                info.购买方纳税人识别号 = scanned['tax_ids'][0]
         else:
             if not self._validate_tax_id(info.购买方纳税人识别号):
                 info.购买方纳税人识别号 = None
-        
+
         if not info.销售方纳税人识别号:
-            tax_ids = self._extract_tax_ids(text)
-            if len(tax_ids) >= 2:
-                info.销售方纳税人识别号 = tax_ids[1]
+            if scanned is None:
+                scanned = self._scan_fields(text)
+            if len(scanned['tax_ids']) >= 2:
+                info.销售方纳税人识别号 = scanned['tax_ids'][1]
         else:
             if not self._validate_tax_id(info.销售方纳税人识别号):
                 info.销售方纳税人识别号 = None
@@ -140,62 +247,55 @@ class HybridExtractor(BaseExtractor):
         
         return info
     
-    def _extract_invoice_number(self, text: str) -> Optional[str]:
-        """使用正则提取发票号码"""
-        # 优先匹配20位电子发票号
-        match = self._patterns['invoice_number_20'].search(text)
-        if match:
-            return match.group(1)
-        
-        # 匹配8位纸质发票号
-        match = self._patterns['invoice_number_8'].search(text)
-        if match:
-            return match.group(1)
-        
-        return None
-    
+    def _scan_fields(self, text: str) -> dict:
+        """单趟扫描全文，收集所有字段的正则候选
+
+        Args:
+            text: 原始文本
+
+        Returns:
+            {'invoice_number': 发票号码（20位电子发票号优先，可能为None）,
+             'tax_ids': 按出现顺序去重的税号列表,
+             'amounts': 金额字符串列表}
+        """
+        # 归一化一次，后续扫描全走半角ASCII分支
+        text = _NFKC('NFKC', text)
+        inv20 = inv8 = None
+        tax_ids = {}  # dict在C层去重且保持插入顺序（CPython 3.7+）
+        amounts = []
+        for m in self._RX_ALL.finditer(text):
+            name = m.lastgroup
+            if name == 'inv20':
+                if inv20 is None:
+                    inv20 = m.group('inv20')
+            elif name == 'inv8':
+                if inv8 is None:
+                    inv8 = m.group('inv8')
+            elif name == 'taxid':
+                tax_ids[m.group('taxid')] = None
+            else:
+                amounts.append(m.group('amt'))
+        return {
+            'invoice_number': inv20 or inv8,
+            'tax_ids': list(tax_ids),
+            'amounts': amounts,
+        }
+
+
     def _validate_invoice_number(self, number: str) -> bool:
-        """验证发票号码格式"""
-        if not number:
-            return False
-        # 电子发票：20位数字
-        if len(number) == 20 and number.isdigit():
-            return True
-        # 纸质发票：8位数字
-        if len(number) == 8 and number.isdigit():
-            return True
-        return False
-    
-    def _extract_tax_ids(self, text: str) -> list:
-        """使用正则提取所有纳税人识别号"""
-        matches = self._patterns['tax_id'].findall(text)
-        # 去重并保持顺序
-        seen = set()
-        result = []
-        for m in matches:
-            if m not in seen:
-                seen.add(m)
-                result.append(m)
-        return result
+        """验证发票号码格式（8位纸质或20位电子）"""
+        return bool(number) and _classify(number) == 'inv'
     
     def _validate_tax_id(self, tax_id: str) -> bool:
-        """验证纳税人识别号格式"""
-        if not tax_id:
-            return False
-        # 标准格式：18位统一社会信用代码
-        if len(tax_id) == 18 and re.match(r'^[0-9A-HJ-NPQRTUWXY]{2}[0-9]{6}[0-9A-HJ-NPQRTUWXY]{10}$', tax_id):
-            return True
-        # 旧格式：15位纳税人识别号
-        if len(tax_id) == 15 and tax_id.isalnum():
-            return True
-        return False
+        """验证纳税人识别号格式（18位统一社会信用代码或15位旧格式）"""
+        return bool(tax_id) and _classify(tax_id) == 'tax'
     
     def _clean_amount(self, amount: str) -> Optional[str]:
         """清理金额字符串"""
         if not amount:
             return None
-        # 移除货币符号和空格
-        amount = re.sub(r'[￥¥,，\s]', '', str(amount))
+        # 移除货币符号和空格（str.translate为纯C实现，快于re.sub）
+        amount = str(amount).translate(_AMOUNT_STRIP)
         # 验证是否为有效数字
         try:
             float(amount)
@@ -206,27 +306,81 @@ class HybridExtractor(BaseExtractor):
 
 class RegexFallbackExtractor(BaseExtractor):
     """正则表达式兜底提取器（当LLM不可用时使用）"""
-    
-    def __init__(self):
-        self._patterns = {
-            'invoice_number': re.compile(r'发票号码[：:]\s*(\d{8,20})'),
-            'purchaser_name': re.compile(r'(购买方|购方|买方)\s*名\s*称[：:]\s*([^\n]+)'),
-            'seller_name': re.compile(r'(销售方|销方|卖方)\s*名\s*称[：:]\s*([^\n]+)'),
-            'tax_id': re.compile(r'纳税人识别号[：:]\s*([A-Za-z0-9]{15,20})'),
-            'amount': re.compile(r'(价税合计|合计)[：:￥¥]?\s*(\d+\.?\d*)'),
-        }
-    
+
+    # 类级预编译正则（所有实例共享，实例化零开销）；兜底模式下逐文件
+    # 全文扫描是唯一热点，与混合提取器一样走可选的线性时间re2引擎
+    # 输入经NFKC归一化后全角标点已折叠，模式体只保留半角ASCII分支；
+    # 标签后的空白与数字量词均有界，避免病态行上的回溯放大
+    _patterns = {
+        'invoice_number': _re2.compile(r'发票号码:\s{0,4}(\d{8,20})'),
+        'purchaser_name': _re2.compile(r'(购买方|购方|买方)\s{0,4}名\s{0,4}称:\s{0,4}([^\n]+)'),
+        'seller_name': _re2.compile(r'(销售方|销方|卖方)\s{0,4}名\s{0,4}称:\s{0,4}([^\n]+)'),
+        'tax_id': _re2.compile(r'纳税人识别号:\s{0,4}([A-Za-z0-9]{15,20})'),
+        'amount': _re2.compile(r'(价税合计|合计)[:¥]?\s{0,4}(\d{1,12}(?:\.\d{1,2})?)'),
+    }
+
+    # 标签关键词 -> 模式名：每个关键词都是对应模式的合法前缀，
+    # 自动机命中处可直接用 pattern.match(text, pos) 锚定验证
+    _KEYWORD_TO_PATTERN = {
+        '发票号码': 'invoice_number',
+        '购买方': 'purchaser_name', '购方': 'purchaser_name', '买方': 'purchaser_name',
+        '销售方': 'seller_name', '销方': 'seller_name', '卖方': 'seller_name',
+        '纳税人识别号': 'tax_id',
+        '价税合计': 'amount', '合计': 'amount',
+    }
+
+    if _ahocorasick is not None:
+        _AUTOMATON = _ahocorasick.Automaton()
+        for _kw, _key in _KEYWORD_TO_PATTERN.items():
+            _AUTOMATON.add_word(_kw, (len(_kw), _key))
+        _AUTOMATON.make_automaton()
+        del _kw, _key
+    else:
+        _AUTOMATON = None
+
+    def _scan_labels(self, text: str):
+        """Trie单趟定位标签关键词，命中处锚定匹配对应模式
+
+        Args:
+            text: 原始文本
+
+        Returns:
+            (模式名->首个Match对象的字典, 按出现顺序的税号列表)
+        """
+        matches = {}
+        tax_ids = []
+        for end, (kw_len, key) in self._AUTOMATON.iter(text):
+            m = self._patterns[key].match(text, end - kw_len + 1)
+            if m is None:
+                continue
+            if key == 'tax_id':
+                tax_ids.append(m.group(1))
+            elif key not in matches:
+                matches[key] = m
+        return matches, tax_ids
+
     def extract(self, text: str, file_path: Optional[str] = None) -> InvoiceInfo:
         """使用正则表达式提取发票信息"""
-        logger.info("使用正则兜底提取器")
-        
-        def find(pattern_key: str, group: int = 1) -> Optional[str]:
-            match = self._patterns[pattern_key].search(text)
-            return match.group(group).strip() if match else None
-        
-        # 提取税号（可能有多个）
-        tax_ids = self._patterns['tax_id'].findall(text)
-        
+        # 兜底模式逐文件高频调用，按文件记debug级别避免日志成为瓶颈
+        logger.debug("使用正则兜底提取器")
+
+        # 归一化一次，后续扫描全走半角ASCII分支
+        text = _NFKC('NFKC', text)
+
+        if self._AUTOMATON is not None:
+            matches, tax_ids = self._scan_labels(text)
+
+            def find(pattern_key: str, group: int = 1) -> Optional[str]:
+                match = matches.get(pattern_key)
+                return match.group(group).strip() if match else None
+        else:
+            def find(pattern_key: str, group: int = 1) -> Optional[str]:
+                match = self._patterns[pattern_key].search(text)
+                return match.group(group).strip() if match else None
+
+            # 提取税号（可能有多个）
+            tax_ids = self._patterns['tax_id'].findall(text)
+
         info = InvoiceInfo(
             发票号码=find('invoice_number'),
             购买方名称=find('purchaser_name', 2),
@@ -7,16 +7,41 @@ LLM发票信息提取器
 
 import re
 import json
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import List, Optional, Dict, Any
 
 from .base import BaseExtractor, InvoiceInfo
 from ..llm.base_adapter import BaseLLMAdapter
-from ..llm.factory import get_llm
-from ..config.prompts import build_extraction_prompt, build_vision_prompt
+from ..config.prompts import (
+    build_extraction_prompt,
+    build_batch_extraction_prompt,
+    build_vision_prompt,
+    INVOICE_RESPONSE_SCHEMA,
+    INVOICE_BATCH_RESPONSE_SCHEMA,
+)
+from ..config.settings import MAX_TEXT_LENGTH
 
 logger = logging.getLogger(__name__)
 
+# 可选的orjson（SIMD加速解析器，中等大小响应约2-5x于标准库）
+# 其JSONDecodeError是json.JSONDecodeError的子类，异常处理无需改动
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# 备用解析的字段模式
+_FALLBACK_PATTERNS = {
+    "发票号码": re.compile(r'"发票号码"[：:]\s*"?([^",\n]+)"?'),
+    "购买方名称": re.compile(r'"购买方名称"[：:]\s*"([^"]+)"'),
+    "销售方名称": re.compile(r'"销售方名称"[：:]\s*"([^"]+)"'),
+    "购买方纳税人识别号": re.compile(r'"购买方纳税人识别号"[：:]\s*"?([A-Za-z0-9]+)"?'),
+    "销售方纳税人识别号": re.compile(r'"销售方纳税人识别号"[：:]\s*"?([A-Za-z0-9]+)"?'),
+    "价税合计": re.compile(r'"价税合计"[：:]\s*"?([0-9.]+)"?'),
+    "发票类型": re.compile(r'"发票类型"[：:]\s*"([^"]+)"'),
+}
+
 
 class LLMInvoiceExtractor(BaseExtractor):
     """LLM发票信息提取器"""
@@ -33,8 +58,11 @@ class LLMInvoiceExtractor(BaseExtractor):
             text_adapter: 文本LLM适配器（用于PDF/OFD/XML文本提取）
             vision_adapter: 视觉LLM适配器（用于图片识别）
         """
-        # 兼容旧接口
-        self.text_adapter = text_adapter or get_llm()
+        # 兼容旧接口（工厂惰性导入，避免无适配器场景加载全部provider模块）
+        if text_adapter is None:
+            from ..llm.factory import get_llm
+            text_adapter = get_llm()
+        self.text_adapter = text_adapter
         self.vision_adapter = vision_adapter or self.text_adapter
         # 保留 adapter 属性用于兼容
         self.adapter = self.text_adapter
@@ -56,8 +84,10 @@ class LLMInvoiceExtractor(BaseExtractor):
         prompt = build_extraction_prompt(text)
         
         try:
-            # 调用LLM（使用文本适配器）
-            response = self.text_adapter.generate(prompt, temperature=0.1)
+            # 调用LLM（使用文本适配器，带响应缓存）
+            response = self.text_adapter.generate_cached(
+                prompt, temperature=0.1, response_schema=INVOICE_RESPONSE_SCHEMA
+            )
             
             # 解析响应
             info = self._parse_response(response)
@@ -72,6 +102,228 @@ class LLMInvoiceExtractor(BaseExtractor):
             logger.error(f"LLM提取失败: {e}")
             return InvoiceInfo(提取方式="llm_failed", 原始响应=str(e))
     
+    async def aextract(self, text: str, file_path: Optional[str] = None) -> InvoiceInfo:
+        """
+        异步从文本中提取发票信息
+
+        与 extract 逻辑一致，但通过适配器的 agenerate 发起请求，
+        可配合 aextract_many 并发处理多张发票。
+
+        Args:
+            text: 发票文本内容
+            file_path: 原始文件路径
+
+        Returns:
+            提取的发票信息
+        """
+        logger.info(f"使用LLM异步提取发票信息: {file_path or '文本输入'}")
+
+        prompt = build_extraction_prompt(text)
+
+        try:
+            response = await self.text_adapter.agenerate_cached(
+                prompt, temperature=0.1, response_schema=INVOICE_RESPONSE_SCHEMA
+            )
+
+            info = self._parse_response(response)
+            info.提取方式 = "llm"
+            info.原始响应 = response
+            info.置信度 = info.get_completeness_score()
+
+            logger.info(f"LLM异步提取完成，完整度: {info.置信度:.2f}")
+            return info
+
+        except Exception as e:
+            logger.error(f"LLM异步提取失败: {e}")
+            return InvoiceInfo(提取方式="llm_failed", 原始响应=str(e))
+
+    async def aextract_many(
+        self,
+        texts: List[str],
+        concurrency: int = 16
+    ) -> List[InvoiceInfo]:
+        """
+        并发提取多张发票
+
+        使用 asyncio.gather 同时发起多个LLM请求，重叠网络等待时间，
+        通过信号量限制并发数以避免触发提供商的限流。
+
+        Args:
+            texts: 发票文本列表
+            concurrency: 最大并发请求数（默认16）
+
+        Returns:
+            与输入顺序对应的发票信息列表
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(text: str) -> InvoiceInfo:
+            async with semaphore:
+                return await self.aextract(text)
+
+        return list(await asyncio.gather(*(_one(t) for t in texts)))
+
+    def extract_many(self, texts: List[str], concurrency: int = 16) -> List[InvoiceInfo]:
+        """
+        同步入口：并发提取多张发票（供CLI等同步调用方使用）
+
+        Args:
+            texts: 发票文本列表
+            concurrency: 最大并发请求数
+
+        Returns:
+            与输入顺序对应的发票信息列表
+        """
+        return asyncio.run(self.aextract_many(texts, concurrency=concurrency))
+
+    def extract_batch(self, texts: List[str], concurrency: int = 4) -> List[InvoiceInfo]:
+        """
+        批量提取：将多张发票打包进一次LLM调用
+
+        按 MAX_TEXT_LENGTH 估算token预算自动分组，每组构建一个
+        带编号分隔符的批量Prompt并要求返回JSON数组，摊薄每次请求的
+        prefill和HTTP开销。产生多组时在单事件循环上并发发起各组请求
+        （信号量限流），重叠网络等待。解析失败时逐张回退到单条提取。
+
+        Args:
+            texts: 发票文本列表
+            concurrency: 多组时的最大并发请求数
+
+        Returns:
+            与输入顺序对应的发票信息列表
+        """
+        groups = self._make_batches(texts)
+
+        if len(groups) > 1:
+            try:
+                return asyncio.run(self._aextract_groups(groups, concurrency))
+            except RuntimeError:
+                # 调用方已持有运行中的事件循环，退回顺序路径
+                logger.debug("事件循环已存在，批量提取走顺序路径")
+
+        results: List[InvoiceInfo] = []
+        for group in groups:
+            if len(group) == 1:
+                results.append(self.extract(group[0]))
+                continue
+
+            logger.info(f"批量LLM提取: {len(group)} 张发票/次请求")
+            prompt = build_batch_extraction_prompt(group)
+
+            try:
+                response = self.text_adapter.generate_cached(
+                    prompt, temperature=0.1, response_schema=INVOICE_BATCH_RESPONSE_SCHEMA
+                )
+                infos = self._parse_batch_response(response, len(group))
+            except Exception as e:
+                logger.error(f"批量LLM提取失败: {e}")
+                infos = None
+
+            if infos is None:
+                # 批量解析失败，逐张回退
+                logger.warning("批量响应解析失败，回退为逐张提取")
+                infos = [self.extract(text) for text in group]
+
+            results.extend(infos)
+
+        return results
+
+    async def _aextract_groups(
+        self, groups: List[List[str]], concurrency: int
+    ) -> List[InvoiceInfo]:
+        """
+        并发提取多个发票分组
+
+        每组仍是一次批量请求；各组请求通过 agenerate_cached 在同一
+        事件循环上并发在途，等待的是套接字而非工作线程。
+
+        Args:
+            groups: _make_batches 产出的发票分组
+            concurrency: 最大并发请求数
+
+        Returns:
+            与输入顺序对应的发票信息列表
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one_group(group: List[str]) -> List[InvoiceInfo]:
+            async with semaphore:
+                if len(group) == 1:
+                    return [await self.aextract(group[0])]
+
+                logger.info(f"批量LLM提取: {len(group)} 张发票/次请求")
+                prompt = build_batch_extraction_prompt(group)
+                try:
+                    response = await self.text_adapter.agenerate_cached(
+                        prompt, temperature=0.1,
+                        response_schema=INVOICE_BATCH_RESPONSE_SCHEMA,
+                    )
+                    infos = self._parse_batch_response(response, len(group))
+                except Exception as e:
+                    logger.error(f"批量LLM提取失败: {e}")
+                    infos = None
+
+                if infos is None:
+                    logger.warning("批量响应解析失败，回退为逐张提取")
+                    infos = [await self.aextract(text) for text in group]
+                return infos
+
+        group_results = await asyncio.gather(*(_one_group(g) for g in groups))
+        return [info for infos in group_results for info in infos]
+
+    def _make_batches(self, texts: List[str], max_per_batch: int = 8) -> List[List[str]]:
+        """按文本长度预算将发票分组（~4字符/token估算）"""
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_len = 0
+
+        for text in texts:
+            text_len = len(text)
+            if current and (
+                current_len + text_len > MAX_TEXT_LENGTH
+                or len(current) >= max_per_batch
+            ):
+                batches.append(current)
+                current = []
+                current_len = 0
+            current.append(text)
+            current_len += text_len
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def _parse_batch_response(self, response: str, expected: int) -> Optional[List[InvoiceInfo]]:
+        """
+        解析批量响应中的JSON数组
+
+        Returns:
+            发票信息列表；数组缺失或长度不符时返回None
+        """
+        json_str = self._fix_json(self._strip_json_fence(response))
+
+        try:
+            data = _json_loads(json_str)
+        except json.JSONDecodeError as e:
+            logger.warning(f"批量JSON解析失败: {e}")
+            return None
+
+        if not isinstance(data, list) or len(data) != expected:
+            logger.warning(
+                f"批量响应数量不符: 期望 {expected}, "
+                f"实际 {len(data) if isinstance(data, list) else type(data).__name__}"
+            )
+            return None
+
+        infos = []
+        for item in data:
+            info = self._info_from_dict(item if isinstance(item, dict) else {})
+            info.提取方式 = "llm_batch"
+            info.置信度 = info.get_completeness_score()
+            infos.append(info)
+        return infos
+
     def extract_from_image(self, image_path: str) -> InvoiceInfo:
         """
         从图片中提取发票信息（多模态）
@@ -88,8 +340,8 @@ class LLMInvoiceExtractor(BaseExtractor):
         prompt = build_vision_prompt()
         
         try:
-            # 调用多模态API（使用视觉适配器）
-            response = self.vision_adapter.generate_with_image(prompt, image_path, temperature=0.1)
+            # 调用多模态API（使用视觉适配器，按图片内容哈希缓存）
+            response = self.vision_adapter.generate_with_image_cached(prompt, image_path, temperature=0.1)
             
             # 解析响应
             info = self._parse_response(response)
@@ -104,6 +356,38 @@ class LLMInvoiceExtractor(BaseExtractor):
             logger.error(f"LLM视觉识别失败: {e}")
             return InvoiceInfo(提取方式="llm_vision_failed", 原始响应=str(e))
     
+    def extract_from_image_bytes(self, image_data: bytes, mime_type: str = "image/png") -> InvoiceInfo:
+        """
+        从内存图片数据中提取发票信息（多模态，无需落盘）
+
+        Args:
+            image_data: 图片二进制数据
+            mime_type: 图片MIME类型
+
+        Returns:
+            提取的发票信息
+        """
+        logger.info(f"使用LLM视觉识别内存图片 ({len(image_data)} 字节)")
+
+        prompt = build_vision_prompt()
+
+        try:
+            response = self.vision_adapter.generate_with_image_bytes_cached(
+                prompt, image_data, mime_type, temperature=0.1
+            )
+
+            info = self._parse_response(response)
+            info.提取方式 = "llm_vision"
+            info.原始响应 = response
+            info.置信度 = info.get_completeness_score()
+
+            logger.info(f"LLM视觉识别完成，完整度: {info.置信度:.2f}")
+            return info
+
+        except Exception as e:
+            logger.error(f"LLM视觉识别失败: {e}")
+            return InvoiceInfo(提取方式="llm_vision_failed", 原始响应=str(e))
+
     def _parse_response(self, response: str) -> InvoiceInfo:
         """
         解析LLM响应，提取JSON数据
@@ -114,59 +398,94 @@ class LLMInvoiceExtractor(BaseExtractor):
         Returns:
             解析后的发票信息
         """
-        # 尝试提取JSON块
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # 尝试直接解析整个响应
-            json_str = response
-        
-        # 清理JSON字符串
-        json_str = json_str.strip()
-        
-        # 尝试修复常见的JSON问题
-        json_str = self._fix_json(json_str)
+        # 提取JSON块并修复常见格式问题
+        json_str = self._fix_json(self._strip_json_fence(response))
         
         try:
-            data = json.loads(json_str)
-            
-            return InvoiceInfo(
-                发票号码=self._clean_value(data.get("发票号码")),
-                发票类型=self._clean_value(data.get("发票类型")),
-                开票日期=self._clean_value(data.get("开票日期")),
-                购买方名称=self._clean_value(data.get("购买方名称")),
-                购买方纳税人识别号=self._clean_value(data.get("购买方纳税人识别号")),
-                销售方名称=self._clean_value(data.get("销售方名称")),
-                销售方纳税人识别号=self._clean_value(data.get("销售方纳税人识别号")),
-                金额=self._clean_value(data.get("金额") or data.get("金额（不含税）")),
-                税额=self._clean_value(data.get("税额")),
-                价税合计=self._clean_value(data.get("价税合计")),
-                发票内容=self._clean_value(data.get("发票内容") or data.get("发票内容/商品名称")),
-                备注=self._clean_value(data.get("备注")),
-            )
-            
+            data = _json_loads(json_str)
+            return self._info_from_dict(data)
+
         except json.JSONDecodeError as e:
             logger.warning(f"JSON解析失败: {e}")
             # 尝试使用正则表达式提取关键信息
             return self._fallback_parse(response)
+
+    def _info_from_dict(self, data: Dict[str, Any]) -> InvoiceInfo:
+        """将LLM返回的字典映射为发票信息"""
+        return InvoiceInfo(
+            发票号码=self._clean_value(data.get("发票号码")),
+            发票类型=self._clean_value(data.get("发票类型")),
+            开票日期=self._clean_value(data.get("开票日期")),
+            购买方名称=self._clean_value(data.get("购买方名称")),
+            购买方纳税人识别号=self._clean_value(data.get("购买方纳税人识别号")),
+            销售方名称=self._clean_value(data.get("销售方名称")),
+            销售方纳税人识别号=self._clean_value(data.get("销售方纳税人识别号")),
+            金额=self._clean_value(data.get("金额") or data.get("金额（不含税）")),
+            税额=self._clean_value(data.get("税额")),
+            价税合计=self._clean_value(data.get("价税合计")),
+            发票内容=self._clean_value(data.get("发票内容") or data.get("发票内容/商品名称")),
+            备注=self._clean_value(data.get("备注")),
+        )
     
+    def _strip_json_fence(self, response: str) -> str:
+        """
+        提取```json围栏中的内容
+
+        基于C层str.find定位围栏边界，避免对长响应做正则DOTALL扫描；
+        无围栏时返回整个响应。
+        """
+        start = response.find('```json')
+        if start == -1:
+            return response.strip()
+        start += len('```json')
+        end = response.find('```', start)
+        if end == -1:
+            return response[start:].strip()
+        return response[start:end].strip()
+
     def _fix_json(self, json_str: str) -> str:
-        """修复常见的JSON格式问题"""
+        """修复常见的JSON格式问题（单次线性扫描）"""
         # 移除BOM
-        if json_str.startswith('\ufeff'):
-            json_str = json_str[1:]
-        
+        json_str = json_str.lstrip('\ufeff')
+
         # 处理单引号
         # 注意：这个简单替换可能破坏包含单引号的字符串
         if "'" in json_str and '"' not in json_str:
             json_str = json_str.replace("'", '"')
-        
-        # 移除尾部逗号
-        json_str = re.sub(r',\s*}', '}', json_str)
-        json_str = re.sub(r',\s*]', ']', json_str)
-        
-        return json_str
+
+        # 单次扫描移除 } 和 ] 前的尾部逗号
+        # 跟踪字符串内/外状态，避免误删字符串内容中的逗号
+        out = []
+        append = out.append
+        in_string = False
+        escape = False
+        pending_comma = -1  # out中待定尾部逗号的下标，-1表示无
+
+        for ch in json_str:
+            if in_string:
+                append(ch)
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+                continue
+
+            if ch == '"':
+                in_string = True
+                pending_comma = -1
+            elif ch == ',':
+                pending_comma = len(out)
+            elif ch in '}]':
+                if pending_comma >= 0:
+                    del out[pending_comma]
+                pending_comma = -1
+            elif pending_comma >= 0 and not ch.isspace():
+                pending_comma = -1
+            append(ch)
+
+        return ''.join(out)
     
     def _clean_value(self, value: Any) -> Optional[str]:
         """清理提取的值"""
@@ -184,17 +503,10 @@ class LLMInvoiceExtractor(BaseExtractor):
         备用解析方法：使用正则表达式从响应中提取信息
         """
         logger.info("使用备用正则解析")
-        
-        def extract_field(pattern: str, text: str) -> Optional[str]:
-            match = re.search(pattern, text)
-            return match.group(1).strip() if match else None
-        
-        return InvoiceInfo(
-            发票号码=extract_field(r'"发票号码"[：:]\s*"?([^",\n]+)"?', response),
-            购买方名称=extract_field(r'"购买方名称"[：:]\s*"([^"]+)"', response),
-            销售方名称=extract_field(r'"销售方名称"[：:]\s*"([^"]+)"', response),
-            购买方纳税人识别号=extract_field(r'"购买方纳税人识别号"[：:]\s*"?([A-Za-z0-9]+)"?', response),
-            销售方纳税人识别号=extract_field(r'"销售方纳税人识别号"[：:]\s*"?([A-Za-z0-9]+)"?', response),
-            价税合计=extract_field(r'"价税合计"[：:]\s*"?([0-9.]+)"?', response),
-            发票类型=extract_field(r'"发票类型"[：:]\s*"([^"]+)"', response),
-        )
+
+        fields = {}
+        for field_name, pattern in _FALLBACK_PATTERNS.items():
+            match = pattern.search(response)
+            fields[field_name] = match.group(1).strip() if match else None
+
+        return InvoiceInfo(**fields)
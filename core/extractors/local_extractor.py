@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+本地模型提取器
+
+复用LLM提取器的Prompt构建和响应解析逻辑，但推理在进程内完成
+（llama-cpp-python运行量化GGUF模型），无网络往返、零API成本
+"""
+
+import logging
+from typing import Optional
+
+from .llm_extractor import LLMInvoiceExtractor
+
+logger = logging.getLogger(__name__)
+
+
+class LocalExtractor(LLMInvoiceExtractor):
+    """本地模型发票信息提取器"""
+
+    def __init__(self, model_path: Optional[str] = None, vision_adapter=None):
+        """
+        初始化本地提取器
+
+        Args:
+            model_path: GGUF模型文件路径，为None时从配置读取
+            vision_adapter: 视觉LLM适配器（本地文本模型不支持图片时使用）
+        """
+        from ..llm.local_adapter import LocalLlamaAdapter
+
+        adapter = LocalLlamaAdapter(model_path=model_path)
+        logger.info(f"使用本地模型提取器: {adapter.model_path}")
+        super().__init__(adapter, vision_adapter)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+发票模板缓存
+
+同一销售方批量开具的发票，OCR文本在剥离数字/日期等可变内容后
+几乎完全一致。以剥离后"模板文本"的哈希为键缓存一次LLM提取的
+稳定字段（名称、税号、类型），后续同模板发票命中时只需正则重提
+可变字段（号码、日期、金额），整次LLM调用被跳过
+"""
+
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .base import InvoiceInfo
+
+logger = logging.getLogger(__name__)
+
+# 可变内容归一化：数字串及其中的日期/金额分隔符统一替换为占位符，
+# 使号码、日期、金额的差异不影响模板哈希
+_VARIABLE_PATTERN = re.compile(r'\d[\d.,，/\-年月日时分秒:：]*')
+
+# 模板命中时直接复用的稳定字段（同一销售方开票时基本不变）
+STABLE_FIELDS = (
+    "发票类型",
+    "购买方名称", "购买方纳税人识别号",
+    "销售方名称", "销售方纳税人识别号",
+    "发票内容",
+)
+
+# 可变字段的重提模式（按字段独立，缺失的字段留空而非复用旧值）
+_VARIABLE_FIELD_PATTERNS = {
+    "发票号码": re.compile(r'发票号码[：:]\s*(\d{8,20})|\b(24[4-8]\d{17})\b'),
+    "开票日期": re.compile(r'(\d{4}\s*年\s*\d{1,2}\s*月\s*\d{1,2}\s*日|\d{4}[-/]\d{1,2}[-/]\d{1,2})'),
+    "金额": re.compile(r'金\s*额[：:￥¥]?\s*(\d+\.?\d*)'),
+    "税额": re.compile(r'税\s*额[：:￥¥]?\s*(\d+\.?\d*)'),
+    "价税合计": re.compile(r'[价合][税计][（(]?[大小]?写?[）)]?[：:￥¥（(]*\s*(\d+\.?\d*)'),
+}
+
+# 只有完整度达到该阈值的提取结果才会被存为模板，避免缓存残缺结果
+TEMPLATE_MIN_SCORE = 0.8
+
+
+def template_key(text: str) -> str:
+    """计算模板键：剥离可变内容后取哈希"""
+    normalized = _VARIABLE_PATTERN.sub('#', text)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class TemplateCache:
+    """发票模板LRU缓存（线程安全，所有worker共享）"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, text: str) -> Optional[InvoiceInfo]:
+        """
+        按模板查找并重建发票信息
+
+        命中时复用缓存的稳定字段，用正则从当前文本重提可变字段；
+        连发票号码都提不出来时视为未命中（交还给LLM），
+        保证不会把上一张发票的号码串到这一张上。
+
+        Args:
+            text: 发票文本内容
+
+        Returns:
+            重建的发票信息，未命中或重提失败时返回None
+        """
+        key = template_key(text)
+        with self._lock:
+            stable = self._data.get(key)
+            if stable is None:
+                return None
+            self._data.move_to_end(key)
+
+        info = InvoiceInfo(**stable)
+        for name, pattern in _VARIABLE_FIELD_PATTERNS.items():
+            match = pattern.search(text)
+            if match:
+                # 模式可能有多个捕获组（如8位/20位号码），取命中的那个
+                setattr(info, name, next(g for g in match.groups() if g))
+
+        if not info.发票号码:
+            return None
+
+        info.提取方式 = "template_cache"
+        info.置信度 = info.get_completeness_score()
+        logger.info(f"模板缓存命中，跳过LLM调用，完整度: {info.置信度:.2f}")
+        return info
+
+    def store(self, text: str, info: InvoiceInfo):
+        """
+        将一次LLM提取结果的稳定字段存为模板
+
+        完整度不足的结果不入缓存（可能是识别失败的残缺输出）。
+
+        Args:
+            text: 发票文本内容
+            info: LLM提取的发票信息
+        """
+        if info.get_completeness_score() < TEMPLATE_MIN_SCORE:
+            return
+
+        stable: Dict[str, Optional[str]] = {
+            name: getattr(info, name) for name in STABLE_FIELDS
+        }
+        key = template_key(text)
+        with self._lock:
+            self._data[key] = stable
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
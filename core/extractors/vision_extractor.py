@@ -6,7 +6,7 @@
 """
 
 import logging
-from typing import Optional
+from typing import List, Optional
 
 from .base import BaseExtractor, InvoiceInfo
 from .llm_extractor import LLMInvoiceExtractor
@@ -16,6 +16,50 @@ from ..llm.factory import get_llm
 logger = logging.getLogger(__name__)
 
 
+# 视觉模型通常将长边压到~2048px，渲染更大的图片只会增加PNG体积和上传字节
+_VISION_LONG_EDGE_PX = 2000.0
+
+
+def _zoom_for_page(rect) -> float:
+    """
+    根据页面尺寸计算渲染缩放倍率
+
+    使渲染结果的长边约等于目标像素数，上限2x（低分辨率小页面
+    仍保持清晰度，高分辨率大页面不再浪费像素）
+    """
+    long_edge = max(rect.width, rect.height)  # 单位: pt（1/72英寸）
+    if long_edge <= 0:
+        return 2.0
+    return min(2.0, _VISION_LONG_EDGE_PX / long_edge)
+
+
+def _render_pdf_page(pdf_path: str, page: int, zoom: Optional[float] = None) -> bytes:
+    """
+    将PDF单页渲染为PNG字节（模块级函数，可被进程池序列化）
+
+    Args:
+        pdf_path: PDF文件路径
+        page: 页码（从0开始）
+        zoom: 缩放倍率，为None时根据页面尺寸自适应
+
+    Returns:
+        PNG格式的图片二进制数据
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        page_obj = doc[page]
+        if zoom is None:
+            zoom = _zoom_for_page(page_obj.rect)
+        mat = fitz.Matrix(zoom, zoom)
+        # alpha=False跳过透明通道，减少约25%的像素数据
+        pix = page_obj.get_pixmap(matrix=mat, alpha=False)
+        return pix.tobytes("png")
+    finally:
+        doc.close()
+
+
 class VisionExtractor(BaseExtractor):
     """视觉提取器：直接从图片识别发票信息"""
     
@@ -53,9 +97,84 @@ class VisionExtractor(BaseExtractor):
         
         info = self._llm_extractor.extract_from_image(image_path)
         info.提取方式 = "vision"
-        
+
+        return info
+
+    def extract_from_image_bytes(self, image_data: bytes, mime_type: str = "image/png") -> InvoiceInfo:
+        """
+        从内存图片数据中直接识别发票信息（无需落盘）
+
+        Args:
+            image_data: 图片二进制数据
+            mime_type: 图片MIME类型
+
+        Returns:
+            提取的发票信息
+        """
+        info = self._llm_extractor.extract_from_image_bytes(image_data, mime_type)
+        info.提取方式 = "vision"
+
         return info
     
+    def extract_from_pdf_images(self, pdf_path: str, pages: Optional[List[int]] = None) -> List[InvoiceInfo]:
+        """
+        批量识别PDF多个页面
+
+        渲染为CPU密集型操作，交给进程池并行执行；每页渲染完成后
+        立即发送LLM请求，渲染与网络上传流水线重叠。页面图片全程
+        保持在内存中，不经过文件系统。
+
+        Args:
+            pdf_path: PDF文件路径
+            pages: 页码列表（从0开始），为None时处理所有页面
+
+        Returns:
+            按页码顺序排列的发票信息列表
+        """
+        import os
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        try:
+            import fitz  # PyMuPDF
+        except ImportError:
+            logger.error("需要安装PyMuPDF: pip install pymupdf")
+            return [InvoiceInfo(提取方式="vision_error", 原始响应="缺少PyMuPDF依赖")]
+
+        try:
+            doc = fitz.open(pdf_path)
+            page_count = len(doc)
+            doc.close()
+        except Exception as e:
+            logger.error(f"打开PDF失败: {e}")
+            return [InvoiceInfo(提取方式="vision_error", 原始响应=str(e))]
+
+        if pages is None:
+            pages = list(range(page_count))
+        pages = [p for p in pages if 0 <= p < page_count]
+        if not pages:
+            return []
+
+        logger.info(f"批量视觉识别PDF: {pdf_path}, {len(pages)} 页")
+
+        results = {}
+        max_workers = min(len(pages), os.cpu_count() or 1)
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            future_to_page = {
+                pool.submit(_render_pdf_page, pdf_path, p): p
+                for p in pages
+            }
+            for future in as_completed(future_to_page):
+                page = future_to_page[future]
+                try:
+                    png_bytes = future.result()
+                    results[page] = self.extract_from_image_bytes(png_bytes)
+                except Exception as e:
+                    logger.error(f"第 {page} 页识别失败: {e}")
+                    results[page] = InvoiceInfo(提取方式="vision_error", 原始响应=str(e))
+
+        return [results[p] for p in pages]
+
     def extract_from_pdf_image(self, pdf_path: str, page: int = 0) -> InvoiceInfo:
         """
         将PDF页面转换为图片后识别
@@ -67,43 +186,33 @@ class VisionExtractor(BaseExtractor):
         Returns:
             提取的发票信息
         """
-        import tempfile
-        import os
-        
         try:
             import fitz  # PyMuPDF
         except ImportError:
             logger.error("需要安装PyMuPDF: pip install pymupdf")
             return InvoiceInfo(提取方式="vision_error", 原始响应="缺少PyMuPDF依赖")
-        
+
         try:
             # 打开PDF
             doc = fitz.open(pdf_path)
-            
+
             if page >= len(doc):
                 logger.error(f"页码超出范围: {page} >= {len(doc)}")
+                doc.close()
                 return InvoiceInfo(提取方式="vision_error")
-            
-            # 将页面渲染为图片
+
+            # 将页面渲染为内存中的PNG字节，不经过临时文件
+            # 缩放倍率按页面尺寸自适应，长边约2000px即可满足视觉模型
             page_obj = doc[page]
-            mat = fitz.Matrix(2, 2)  # 2x缩放以提高清晰度
-            pix = page_obj.get_pixmap(matrix=mat)
-            
-            # 保存临时图片
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-                tmp_path = tmp.name
-                pix.save(tmp_path)
-            
-            # 识别图片
-            try:
-                info = self.extract_from_image(tmp_path)
-            finally:
-                # 清理临时文件
-                os.unlink(tmp_path)
-            
+            zoom = _zoom_for_page(page_obj.rect)
+            mat = fitz.Matrix(zoom, zoom)
+            pix = page_obj.get_pixmap(matrix=mat, alpha=False)
+            png_bytes = pix.tobytes("png")
             doc.close()
-            return info
-            
+
+            # 识别图片
+            return self.extract_from_image_bytes(png_bytes)
+
         except Exception as e:
             logger.error(f"PDF转图片识别失败: {e}")
             return InvoiceInfo(提取方式="vision_error", 原始响应=str(e))
@@ -3,21 +3,40 @@
 LLM模块
 
 提供LLM适配器和工厂函数
+
+采用PEP 562惰性导入：各适配器模块（及其背后的SDK）只在
+首次访问对应名称时才真正加载，降低冷启动时间
 """
 
-from .base_adapter import BaseLLMAdapter
-from .gemini_adapter import GeminiAdapter
-from .ollama_adapter import OllamaAdapter
-from .openai_adapter import OpenAIAdapter
-from .deepseek_adapter import DeepSeekAdapter
-from .factory import LLMFactory, get_llm
+import importlib
+
+# 名称 -> 所在子模块 的惰性导入表
+_LAZY_IMPORTS = {
+    "BaseLLMAdapter": ".base_adapter",
+    "GeminiAdapter": ".gemini_adapter",
+    "OllamaAdapter": ".ollama_adapter",
+    "OpenAIAdapter": ".openai_adapter",
+    "OpenAICompatibleAdapter": ".openai_compat",
+    "DeepSeekAdapter": ".deepseek_adapter",
+    "LocalLlamaAdapter": ".local_adapter",
+    "MultiEndpointAdapter": ".multi_adapter",
+    "LLMFactory": ".factory",
+    "get_llm": ".factory",
+    "LLMCache": ".cache",
+    "get_llm_cache": ".cache",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
 
-__all__ = [
-    "BaseLLMAdapter",
-    "GeminiAdapter",
-    "OllamaAdapter", 
-    "OpenAIAdapter",
-    "DeepSeekAdapter",
-    "LLMFactory",
-    "get_llm",
-]
+def __getattr__(name):
+    """惰性解析模块属性（PEP 562）"""
+    try:
+        module_path = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(module_path, __name__)
+    value = getattr(module, name)
+    # 缓存到模块命名空间，后续访问不再经过__getattr__
+    globals()[name] = value
+    return value
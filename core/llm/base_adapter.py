@@ -5,12 +5,140 @@ LLM适配器基类
 定义所有LLM模型适配器的统一接口
 """
 
+import io
+import os
+import time
+import base64
+import asyncio
+import functools
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 可选的pybase64（封装SIMD libbase64，多MB图片编码约5-10x于标准库）
+# 未安装时回退到标准库base64，调用点无需改动
+try:
+    from pybase64 import b64encode_as_string as _b64encode_as_string
+except ImportError:
+    def _b64encode_as_string(data: bytes) -> str:
+        return base64.b64encode(data).decode("ascii")
+
+# 可选的Pillow：有则在上传前压缩过大的扫描图
+# （视觉token数约与像素面积成正比，4000x3000的原始扫描件绝大部分分辨率是浪费）
+try:
+    import PIL.Image as _PIL_Image
+except ImportError:
+    _PIL_Image = None
+
+# 图片预压缩参数：长边上限、JPEG质量、低于此字节数的小图不做处理
+MAX_IMAGE_SIDE = 2048
+JPEG_QUALITY = 85
+COMPRESS_MIN_BYTES = 256 * 1024
+
+# 扩展名 -> MIME类型（各多模态适配器共享）
+_MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+
+def guess_mime(image_path: str) -> str:
+    """按扩展名推断图片MIME类型
+
+    rfind切片取扩展名，比splitext少一次元组构造。
+    """
+    return _MIME_TYPES.get(image_path[image_path.rfind('.'):].lower(), "image/jpeg")
+
+
+def encode_image_data(image_data) -> str:
+    """图片二进制数据编码为base64字符串"""
+    return _b64encode_as_string(image_data)
+
+
+def compress_image(
+    image_data: bytes, mime_type: str, max_side: int = MAX_IMAGE_SIDE
+) -> Tuple[bytes, str]:
+    """
+    压缩过大的图片：长边等比缩放到max_side并重编码为JPEG
+
+    上传字节数和视觉token数随像素面积增长，发票扫描件缩到2048px
+    后字段依然清晰可读，载荷通常缩小3-5倍。
+
+    Args:
+        image_data: 图片二进制数据
+        mime_type: 原始MIME类型
+        max_side: 长边像素上限
+
+    Returns:
+        (压缩后数据, MIME类型)；Pillow缺失、图片较小或压缩无收益时原样返回
+    """
+    if _PIL_Image is None or len(image_data) < COMPRESS_MIN_BYTES:
+        return image_data, mime_type
+
+    try:
+        image = _PIL_Image.open(io.BytesIO(image_data))
+        if max(image.size) <= max_side and mime_type == "image/jpeg":
+            return image_data, mime_type
+        image.thumbnail((max_side, max_side), _PIL_Image.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        compressed = buf.getvalue()
+    except Exception:
+        # 损坏/不支持的图片交给模型侧报错，不在压缩环节拦截
+        return image_data, mime_type
+
+    if len(compressed) >= len(image_data):
+        return image_data, mime_type
+    return compressed, "image/jpeg"
+
+
+@functools.lru_cache(maxsize=64)
+def _encode_image_file(image_path: str, mtime_ns: int, size: int) -> Tuple[str, str]:
+    """按 (路径, mtime, 大小) 缓存文件压缩+base64编码的结果"""
+    with open(image_path, "rb") as f:
+        data = f.read()
+    data, mime_type = compress_image(data, guess_mime(image_path))
+    return mime_type, _b64encode_as_string(data)
+
+
+def encode_image_file(image_path: str) -> Tuple[str, str]:
+    """
+    读取图片文件，压缩后编码为base64
+
+    同一文件（按mtime+大小判定未变化）重复发送时复用结果，
+    免去重复的磁盘读取、压缩和编码。
+
+    Args:
+        image_path: 图片文件路径
+
+    Returns:
+        (MIME类型, base64字符串)
+    """
+    st = os.stat(image_path)
+    return _encode_image_file(image_path, st.st_mtime_ns, st.st_size)
+
+
+def read_image(image_path: str) -> Tuple[bytes, str]:
+    """
+    读取图片文件并按扩展名推断MIME类型
+
+    Args:
+        image_path: 图片文件路径
+
+    Returns:
+        (图片二进制数据, MIME类型)
+    """
+    with open(image_path, "rb") as f:
+        image_data = f.read()
+    return image_data, guess_mime(image_path)
+
 
 class BaseLLMAdapter(ABC):
     """LLM模型适配器基类"""
@@ -33,6 +161,192 @@ class BaseLLMAdapter(ABC):
         """
         pass
     
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """
+        流式发送文本请求，逐块产出增量文本
+
+        下游可在生成完成前就开始解析部分输出，把解析耗时与
+        生成时间重叠。默认实现整段生成后一次性产出，
+        支持流式API的适配器覆盖为真增量。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数（temperature, max_tokens等）
+
+        Yields:
+            模型生成的文本增量
+        """
+        yield self.generate(prompt, **kwargs)
+
+    def generate_cached(self, prompt: str, **kwargs) -> str:
+        """
+        带响应缓存的文本请求
+
+        对低temperature的确定性请求，先查缓存再调用 generate；
+        temperature较高或缓存被禁用时直接透传。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数（temperature, max_tokens等）
+
+        Returns:
+            模型生成的文本响应
+        """
+        from .cache import get_llm_cache, CACHE_TEMPERATURE_LIMIT
+
+        temperature = kwargs.get("temperature", 0.1)
+        cache = get_llm_cache()
+
+        if cache is None or temperature > CACHE_TEMPERATURE_LIMIT:
+            return self.generate(prompt, **kwargs)
+
+        key = cache.make_key(self.model_name, prompt, temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("LLM缓存命中，跳过API调用")
+            return cached
+
+        response = self.generate(prompt, **kwargs)
+        cache.set(key, response)
+        return response
+
+    async def agenerate_cached(self, prompt: str, **kwargs) -> str:
+        """
+        带响应缓存的异步文本请求
+
+        与 generate_cached 逻辑一致，请求通过 agenerate 异步发起；
+        缓存查写是进程内/本地SQLite的同步操作，不值得让出事件循环。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数（temperature, max_tokens等）
+
+        Returns:
+            模型生成的文本响应
+        """
+        from .cache import get_llm_cache, CACHE_TEMPERATURE_LIMIT
+
+        temperature = kwargs.get("temperature", 0.1)
+        cache = get_llm_cache()
+
+        if cache is None or temperature > CACHE_TEMPERATURE_LIMIT:
+            return await self.agenerate(prompt, **kwargs)
+
+        key = cache.make_key(self.model_name, prompt, temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("LLM缓存命中，跳过API调用")
+            return cached
+
+        response = await self.agenerate(prompt, **kwargs)
+        cache.set(key, response)
+        return response
+
+    def generate_with_image_cached(self, prompt: str, image_path: str, **kwargs) -> str:
+        """
+        带响应缓存的多模态请求（文件路径入口）
+
+        读取图片后按内容哈希走缓存，同一张发票图重复识别时
+        跳过视觉模型调用。
+
+        Args:
+            prompt: 输入提示词
+            image_path: 图片文件路径
+            **kwargs: 额外参数
+
+        Returns:
+            模型生成的文本响应
+        """
+        from .cache import get_llm_cache, CACHE_TEMPERATURE_LIMIT
+
+        temperature = kwargs.get("temperature", 0.1)
+        cache = get_llm_cache()
+
+        if cache is None or temperature > CACHE_TEMPERATURE_LIMIT:
+            return self.generate_with_image(prompt, image_path, **kwargs)
+
+        key = cache.make_key(
+            self.model_name, prompt, temperature,
+            image_hash=cache.hash_file(image_path),
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("LLM视觉缓存命中，跳过API调用")
+            return cached
+
+        response = self.generate_with_image(prompt, image_path, **kwargs)
+        cache.set(key, response)
+        return response
+
+    def generate_with_image_bytes_cached(
+        self, prompt: str, image_data: bytes, mime_type: str = "image/png", **kwargs
+    ) -> str:
+        """
+        带响应缓存的多模态请求（内存数据入口）
+
+        Args:
+            prompt: 输入提示词
+            image_data: 图片二进制数据
+            mime_type: 图片MIME类型
+            **kwargs: 额外参数
+
+        Returns:
+            模型生成的文本响应
+        """
+        from .cache import get_llm_cache, CACHE_TEMPERATURE_LIMIT
+
+        temperature = kwargs.get("temperature", 0.1)
+        cache = get_llm_cache()
+
+        if cache is None or temperature > CACHE_TEMPERATURE_LIMIT:
+            return self.generate_with_image_bytes(prompt, image_data, mime_type, **kwargs)
+
+        key = cache.make_key(
+            self.model_name, prompt, temperature,
+            image_hash=cache.hash_image(image_data),
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("LLM视觉缓存命中，跳过API调用")
+            return cached
+
+        response = self.generate_with_image_bytes(prompt, image_data, mime_type, **kwargs)
+        cache.set(key, response)
+        return response
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """
+        异步发送文本请求并获取模型响应
+
+        默认实现通过线程池包装同步的 generate，
+        支持原生异步SDK的适配器可覆盖此方法。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 额外参数（temperature, max_tokens等）
+
+        Returns:
+            模型生成的文本响应
+        """
+        return await asyncio.to_thread(self.generate, prompt, **kwargs)
+
+    async def agenerate_with_image(self, prompt: str, image_path: str, **kwargs) -> str:
+        """
+        异步多模态：发送图片+文本请求
+
+        默认实现通过线程池包装同步的 generate_with_image，
+        支持原生异步SDK的适配器可覆盖此方法。
+
+        Args:
+            prompt: 输入提示词
+            image_path: 图片文件路径
+            **kwargs: 额外参数
+
+        Returns:
+            模型生成的文本响应
+        """
+        return await asyncio.to_thread(self.generate_with_image, prompt, image_path, **kwargs)
+
     @abstractmethod
     def generate_with_image(self, prompt: str, image_path: str, **kwargs) -> str:
         """
@@ -48,9 +362,128 @@ class BaseLLMAdapter(ABC):
         """
         pass
     
+    def generate_with_image_bytes(
+        self, prompt: str, image_data: bytes, mime_type: str = "image/png", **kwargs
+    ) -> str:
+        """
+        多模态：发送内存图片数据+文本请求
+
+        默认实现落盘为临时文件后复用 generate_with_image；
+        子类应覆盖为纯内存路径，避免文件系统往返。
+
+        Args:
+            prompt: 输入提示词
+            image_data: 图片二进制数据
+            mime_type: 图片MIME类型
+            **kwargs: 额外参数
+
+        Returns:
+            模型生成的文本响应
+        """
+        import os
+        import tempfile
+
+        suffix = "." + mime_type.rsplit("/", 1)[-1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            tmp.write(image_data)
+            tmp_path = tmp.name
+        try:
+            return self.generate_with_image(prompt, tmp_path, **kwargs)
+        finally:
+            os.unlink(tmp_path)
+
+    def generate_with_image_encoded(
+        self, prompt: str, mime_type: str, encoded: str, **kwargs
+    ) -> str:
+        """
+        多模态：发送已base64编码的图片+文本请求
+
+        供批处理侧预先编码后直接提交，避免在请求线程内重复
+        读盘+编码。默认实现解码后走 generate_with_image_bytes，
+        以data URL/base64上传的适配器可覆盖为零拷贝路径。
+
+        Args:
+            prompt: 输入提示词
+            mime_type: 图片MIME类型
+            encoded: base64编码的图片数据
+            **kwargs: 额外参数
+
+        Returns:
+            模型生成的文本响应
+        """
+        return self.generate_with_image_bytes(
+            prompt, base64.b64decode(encoded), mime_type, **kwargs
+        )
+
+    # 可用性探测结果的缓存时间（秒）：探测常涉及网络请求或SDK初始化，
+    # 启动/校验阶段会被UI和工厂反复调用，同一会话内无需每次重探
+    PROBE_TTL = 30.0
+
     def is_available(self) -> bool:
-        """检查模型是否可用"""
+        """检查模型是否可用（结果按PROBE_TTL缓存）"""
+        now = time.monotonic()
+        cached = getattr(self, "_probe_cache", None)
+        if cached is not None and now - cached[0] < self.PROBE_TTL:
+            return cached[1]
+        result = self._probe_available()
+        self._probe_cache = (now, result)
+        return result
+
+    def _probe_available(self) -> bool:
+        """实际的可用性探测，子类覆盖此方法而非is_available"""
         return True
+
+    async def arun_batch(self, prompts, max_concurrency: int = 10) -> list:
+        """
+        并发执行一批文本请求
+
+        用 asyncio.gather 重叠网络等待时间，信号量限制在途请求数
+        以避免触发提供商限流；网络延迟主导时加速接近线性。
+
+        Args:
+            prompts: 提示词列表
+            max_concurrency: 最大并发请求数
+
+        Returns:
+            与输入顺序对应的响应列表
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _one(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate(prompt)
+
+        return list(await asyncio.gather(*(_one(p) for p in prompts)))
+
+    def run_batch(self, prompts, max_concurrency: int = 10) -> list:
+        """同步入口：并发执行一批文本请求（供同步调用方使用）"""
+        return asyncio.run(self.arun_batch(prompts, max_concurrency=max_concurrency))
+
+    def run_image_batch(self, tasks, prefetch: int = 4) -> list:
+        """
+        顺序处理一批 (prompt, 图片路径) 任务
+
+        用线程池预先读取+压缩+编码后续图片，使磁盘I/O与在途的
+        HTTP请求重叠，单张图片的编码耗时不再串行计入总时长。
+
+        Args:
+            tasks: (提示词, 图片路径) 元组列表
+            prefetch: 预编码线程数
+
+        Returns:
+            与输入顺序对应的响应列表
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        results = []
+        with ThreadPoolExecutor(max_workers=prefetch) as executor:
+            futures = [executor.submit(encode_image_file, path) for _, path in tasks]
+            for (prompt, _), future in zip(tasks, futures):
+                mime_type, encoded = future.result()
+                results.append(
+                    self.generate_with_image_encoded(prompt, mime_type, encoded)
+                )
+        return results
     
     def get_model_info(self) -> Dict[str, Any]:
         """获取模型信息"""
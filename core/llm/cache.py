@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+LLM响应缓存
+
+对确定性的提取请求（低temperature）按 模型+提示词+温度 的哈希缓存响应，
+重复运行同一批发票时命中缓存可跳过HTTP往返并节省token费用
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 温度高于此阈值时视为非确定性请求，不走缓存
+CACHE_TEMPERATURE_LIMIT = 0.3
+
+
+class MemoryBackend:
+    """内存LRU缓存后端"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            # 命中后移到末尾（LRU）
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class SqliteBackend:
+    """SQLite磁盘缓存后端（跨进程/跨运行持久化）"""
+
+    def __init__(self, db_path: str, ttl: int = 0):
+        """
+        Args:
+            db_path: 数据库文件路径
+            ttl: 缓存有效期（秒），0表示永不过期
+        """
+        import sqlite3
+
+        self.db_path = str(db_path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # WAL模式：读写互不阻塞，写入只追加日志，适合多线程批处理下的并发命中查询
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT, ts INT)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, ts FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, ts = row
+        if self.ttl and time.time() - ts > self.ttl:
+            return None
+        return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, ts) VALUES (?, ?, ?)",
+                (key, value, int(time.time()))
+            )
+            self._conn.commit()
+
+
+class LLMCache:
+    """
+    LLM响应缓存
+
+    key = sha256(模型名 + 提示词 + 温度)，value为原始响应文本
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        # 命中/未命中计数（进程内），批处理结束时随统计输出
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        prompt: str,
+        temperature: float,
+        image_hash: Optional[str] = None,
+    ) -> str:
+        """计算缓存键（多模态请求额外混入图片内容哈希）"""
+        payload = json.dumps(
+            {"m": model_name, "p": prompt, "t": temperature, "i": image_hash},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def hash_image(image_data: bytes) -> str:
+        """计算图片内容哈希（同一张发票图重复识别时命中缓存）"""
+        return hashlib.sha256(image_data).hexdigest()
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """流式计算文件内容哈希（1MiB分块，不整文件驻留内存）"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        self.backend.set(key, value)
+
+
+# 模块级单例（按配置惰性创建）
+_default_cache: Optional[LLMCache] = None
+_cache_init_done = False
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    获取默认LLM缓存实例
+
+    根据 settings.LLM_CACHE_BACKEND 创建:
+        - "sqlite": SQLite磁盘缓存（默认，跨运行复用）
+        - "memory": 内存LRU缓存
+        - "none": 禁用缓存
+
+    Returns:
+        缓存实例，禁用时返回None
+    """
+    global _default_cache, _cache_init_done
+
+    if _cache_init_done:
+        return _default_cache
+
+    from ..config.settings import LLM_CACHE_BACKEND, LLM_CACHE_TTL, OUTPUT_DIR
+
+    backend_name = (LLM_CACHE_BACKEND or "memory").lower()
+    try:
+        if backend_name == "none":
+            _default_cache = None
+        elif backend_name == "sqlite":
+            db_path = Path(OUTPUT_DIR) / ".llm_cache.sqlite"
+            _default_cache = LLMCache(SqliteBackend(str(db_path), ttl=LLM_CACHE_TTL))
+        else:
+            _default_cache = LLMCache(MemoryBackend())
+    except Exception as e:
+        logger.warning(f"初始化LLM缓存失败，已禁用缓存: {e}")
+        _default_cache = None
+
+    _cache_init_done = True
+    return _default_cache
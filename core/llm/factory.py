@@ -6,25 +6,27 @@ LLM模型工厂
 """
 
 import logging
+import importlib
+import threading
 from typing import Optional
 
 from .base_adapter import BaseLLMAdapter
-from .gemini_adapter import GeminiAdapter
-from .ollama_adapter import OllamaAdapter
-from .openai_adapter import OpenAIAdapter
-from .deepseek_adapter import DeepSeekAdapter
 
 logger = logging.getLogger(__name__)
 
 
 class LLMFactory:
     """LLM模型工厂"""
-    
+
+    # 提供商 -> (适配器模块, 类名)
+    # 惰性解析：只在真正创建某个提供商时才导入对应模块（及其SDK），
+    # 列出提供商或只用其中一家时不会拖入其他家的依赖
     _adapters = {
-        "gemini": GeminiAdapter,
-        "openai": OpenAIAdapter,
-        "ollama": OllamaAdapter,
-        "deepseek": DeepSeekAdapter,
+        "gemini": (".gemini_adapter", "GeminiAdapter"),
+        "openai": (".openai_adapter", "OpenAIAdapter"),
+        "ollama": (".ollama_adapter", "OllamaAdapter"),
+        "deepseek": (".deepseek_adapter", "DeepSeekAdapter"),
+        "local": (".local_adapter", "LocalLlamaAdapter"),
     }
     
     @classmethod
@@ -50,7 +52,10 @@ class LLMFactory:
         if provider not in cls._adapters:
             raise ValueError(f"不支持的LLM提供商: {provider}，支持的选项: {list(cls._adapters.keys())}")
         
-        adapter_class = cls._adapters[provider]
+        module_path, class_name = cls._adapters[provider]
+        adapter_class = getattr(
+            importlib.import_module(module_path, __package__), class_name
+        )
         
         # 设置默认模型名称
         default_models = {
@@ -59,8 +64,9 @@ class LLMFactory:
             "ollama": "qwen2.5:7b",
             "deepseek": "deepseek-chat",
         }
-        
+
         # 如果model_name为None或空字符串，使用默认值
+        # （local适配器默认取模型文件名，无需在此指定）
         if not model_name:
             model_name = default_models.get(provider)
         
@@ -88,35 +94,89 @@ class LLMFactory:
         )
         
         if LLM_PROVIDER == "gemini":
-            return cls.create("gemini", LLM_MODEL, api_key=GEMINI_API_KEY)
+            return cls._create_pooled("gemini", LLM_MODEL, GEMINI_API_KEY)
         elif LLM_PROVIDER == "openai":
-            return cls.create("openai", LLM_MODEL, api_key=OPENAI_API_KEY)
+            return cls._create_pooled("openai", LLM_MODEL, OPENAI_API_KEY)
         elif LLM_PROVIDER == "ollama":
             model = LLM_MODEL if LLM_MODEL else OLLAMA_MODEL
             return cls.create("ollama", model, base_url=OLLAMA_BASE_URL)
         elif LLM_PROVIDER == "deepseek":
-            return cls.create("deepseek", LLM_MODEL, api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
+            return cls._create_pooled(
+                "deepseek", LLM_MODEL, DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL
+            )
+        elif LLM_PROVIDER == "local":
+            from ..config.settings import LOCAL_MODEL_PATH
+            return cls.create("local", model_path=LOCAL_MODEL_PATH)
         else:
             raise ValueError(f"未知的LLM提供商: {LLM_PROVIDER}")
     
+    @classmethod
+    def _create_pooled(cls, provider: str, model_name, api_key: str, **kwargs) -> BaseLLMAdapter:
+        """
+        按API Key创建适配器，多个Key（逗号分隔）时构建负载均衡适配器
+
+        批量处理常被单Key的QPM限流卡住，配置多个Key可轮询分摊请求。
+
+        Args:
+            provider: 提供商名称
+            model_name: 模型名称
+            api_key: API Key，支持逗号分隔的多个Key
+            **kwargs: 传递给适配器的额外参数
+
+        Returns:
+            单Key时为普通适配器，多Key时为MultiEndpointAdapter
+        """
+        keys = [k.strip() for k in (api_key or "").split(",") if k.strip()]
+
+        if len(keys) <= 1:
+            return cls.create(provider, model_name, api_key=api_key, **kwargs)
+
+        from .multi_adapter import MultiEndpointAdapter
+
+        logger.info(f"{provider} 配置了 {len(keys)} 个API Key，启用负载均衡")
+        adapters = [
+            cls.create(provider, model_name, api_key=key, **kwargs) for key in keys
+        ]
+        return MultiEndpointAdapter(adapters)
+
     @classmethod
     def list_providers(cls) -> list:
         """列出支持的提供商"""
         return list(cls._adapters.keys())
 
 
+# 适配器单例缓存：同一(provider, model, 参数)组合只构建一次。
+# 适配器内部惰性持有SDK客户端，复用实例即复用TLS会话和连接池，
+# 避免每张发票新建提取器时重复TCP/TLS握手
+_ADAPTER_CACHE = {}
+_ADAPTER_LOCK = threading.Lock()
+
+
 def get_llm(provider: str = None, model_name: str = None, **kwargs) -> BaseLLMAdapter:
     """
-    便捷函数：获取LLM适配器
-    
+    便捷函数：获取LLM适配器（进程级单例）
+
     Args:
         provider: 提供商名称，为None时从配置读取
         model_name: 模型名称，为None时使用默认值
         **kwargs: 额外参数
-        
+
     Returns:
-        LLM适配器实例
+        LLM适配器实例（相同参数返回同一实例）
     """
-    if provider is None:
-        return LLMFactory.create_from_config()
-    return LLMFactory.create(provider, model_name, **kwargs)
+    key = (provider, model_name, tuple(sorted(kwargs.items())))
+
+    adapter = _ADAPTER_CACHE.get(key)
+    if adapter is not None:
+        return adapter
+
+    with _ADAPTER_LOCK:
+        # 双重检查，避免并发线程各自构建客户端
+        adapter = _ADAPTER_CACHE.get(key)
+        if adapter is None:
+            if provider is None:
+                adapter = LLMFactory.create_from_config()
+            else:
+                adapter = LLMFactory.create(provider, model_name, **kwargs)
+            _ADAPTER_CACHE[key] = adapter
+    return adapter
@@ -8,12 +8,20 @@ Gemini API 适配器
 import os
 import base64
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
-from .base_adapter import BaseLLMAdapter
+from .base_adapter import BaseLLMAdapter, MAX_IMAGE_SIDE, compress_image
+from ..config import settings
+from ..config.prompts import EXTRACTION_PROMPT_PREFIX
 
 logger = logging.getLogger(__name__)
 
+# PIL在模块导入时绑定一次，避免每次图片调用都做导入查找
+try:
+    import PIL.Image as _PIL_Image
+except ImportError:
+    _PIL_Image = None
+
 
 class GeminiAdapter(BaseLLMAdapter):
     """Google Gemini API 适配器"""
@@ -23,7 +31,10 @@ class GeminiAdapter(BaseLLMAdapter):
         self.api_key = api_key or os.environ.get("GEMINI_API_KEY", "")
         self._client = None
         self._model = None
-        
+        # 显式上下文缓存：提取指令前缀只上传/预填一次，后续请求引用缓存句柄
+        self._cached_model = None
+        self._prompt_cache_failed = False
+
     def _ensure_client(self):
         """确保客户端已初始化"""
         if self._client is None:
@@ -39,6 +50,55 @@ class GeminiAdapter(BaseLLMAdapter):
                 logger.error(f"Gemini客户端初始化失败: {e}")
                 raise
     
+    def _model_for_prompt(self, prompt: str):
+        """
+        选择处理该提示词的模型，静态前缀命中时走上下文缓存
+
+        提取Prompt的指令前缀跨请求完全一致，首次命中时通过Context
+        Caching API上传为CachedContent（TTL一小时），之后的请求只发送
+        前缀之外的发票内容，前缀的prefill由服务端复用。创建失败
+        （SDK过旧、模型不支持、低于最小token数等）则记住并回退普通路径。
+
+        Returns:
+            (模型对象, 需实际发送的提示词)
+        """
+        if (
+            not settings.PROMPT_CACHE_ENABLED
+            or self._prompt_cache_failed
+            or not prompt.startswith(EXTRACTION_PROMPT_PREFIX)
+        ):
+            return self._model, prompt
+
+        if self._cached_model is None:
+            try:
+                from google.generativeai import caching
+                cached = caching.CachedContent.create(
+                    model=self.model_name,
+                    system_instruction=EXTRACTION_PROMPT_PREFIX,
+                    ttl="3600s",
+                )
+                self._cached_model = self._client.GenerativeModel.from_cached_content(cached)
+                logger.info("Gemini上下文缓存已创建，提取指令前缀将跨请求复用")
+            except Exception as e:
+                logger.debug(f"Gemini上下文缓存不可用，回退普通请求: {e}")
+                self._prompt_cache_failed = True
+                return self._model, prompt
+
+        return self._cached_model, prompt[len(EXTRACTION_PROMPT_PREFIX):]
+
+    @staticmethod
+    def _generation_config(kwargs) -> dict:
+        """构造生成参数，传入response_schema时启用结构化JSON输出"""
+        generation_config = {
+            "temperature": kwargs.get("temperature", 0.1),
+            "max_output_tokens": kwargs.get("max_output_tokens", 2048),
+        }
+        response_schema = kwargs.get("response_schema")
+        if response_schema:
+            generation_config["response_mime_type"] = "application/json"
+            generation_config["response_schema"] = response_schema
+        return generation_config
+
     def generate(self, prompt: str, **kwargs) -> str:
         """
         发送文本请求
@@ -56,26 +116,80 @@ class GeminiAdapter(BaseLLMAdapter):
         
         try:
             # 配置生成参数
-            generation_config = {
-                "temperature": kwargs.get("temperature", 0.1),
-                "max_output_tokens": kwargs.get("max_output_tokens", 2048),
-            }
-            
-            response = self._model.generate_content(
+            generation_config = self._generation_config(kwargs)
+
+            model, prompt = self._model_for_prompt(prompt)
+            response = model.generate_content(
                 prompt,
                 generation_config=generation_config
             )
-            
+
             return response.text
-            
+
         except Exception as e:
             logger.error(f"Gemini API调用失败: {e}")
             raise
     
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """
+        流式发送文本请求，逐块产出增量文本
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 可选参数
+
+        Yields:
+            模型生成的文本增量
+        """
+        self._ensure_client()
+
+        try:
+            response = self._model.generate_content(
+                prompt,
+                generation_config=self._generation_config(kwargs),
+                stream=True,
+            )
+
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+
+        except Exception as e:
+            logger.error(f"Gemini 流式API调用失败: {e}")
+            raise
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """
+        异步发送文本请求（用于并发批处理）
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 可选参数
+
+        Returns:
+            模型生成的文本
+        """
+        self._ensure_client()
+
+        try:
+            generation_config = self._generation_config(kwargs)
+
+            model, prompt = self._model_for_prompt(prompt)
+            response = await model.generate_content_async(
+                prompt,
+                generation_config=generation_config
+            )
+
+            return response.text
+
+        except Exception as e:
+            logger.error(f"Gemini 异步API调用失败: {e}")
+            raise
+
     def generate_with_image(self, prompt: str, image_path: str, **kwargs) -> str:
         """
         多模态：发送图片+文本请求
-        
+
         Args:
             prompt: 输入提示词
             image_path: 图片文件路径
@@ -84,35 +198,71 @@ class GeminiAdapter(BaseLLMAdapter):
         Returns:
             模型生成的文本
         """
+        if _PIL_Image is None:
+            raise ImportError("请安装 Pillow: pip install Pillow")
+
         self._ensure_client()
-        
+
         try:
-            import PIL.Image
-            
-            # 加载图片
-            image = PIL.Image.open(image_path)
-            
+            # 加载图片；大图预先等比缩放，SDK直接接受PIL对象，无需base64
+            image = _PIL_Image.open(image_path)
+            max_side = kwargs.get("max_image_side", MAX_IMAGE_SIDE)
+            if max(image.size) > max_side:
+                image.thumbnail((max_side, max_side), _PIL_Image.LANCZOS)
+
             # 配置生成参数
+            generation_config = self._generation_config(kwargs)
+
+            # 发送多模态请求
+            response = self._model.generate_content(
+                [prompt, image],
+                generation_config=generation_config
+            )
+
+            return response.text
+
+        except Exception as e:
+            logger.error(f"Gemini 多模态API调用失败: {e}")
+            raise
+
+    def generate_with_image_bytes(
+        self, prompt: str, image_data: bytes, mime_type: str = "image/png", **kwargs
+    ) -> str:
+        """
+        多模态：发送内存图片数据+文本请求（无需落盘）
+
+        Args:
+            prompt: 输入提示词
+            image_data: 图片二进制数据
+            mime_type: 图片MIME类型
+            **kwargs: 可选参数
+
+        Returns:
+            模型生成的文本
+        """
+        self._ensure_client()
+
+        image_data, mime_type = compress_image(image_data, mime_type)
+
+        try:
             generation_config = {
                 "temperature": kwargs.get("temperature", 0.1),
                 "max_output_tokens": kwargs.get("max_output_tokens", 2048),
             }
-            
-            # 发送多模态请求
+
+            # Gemini支持内联图片数据
             response = self._model.generate_content(
-                [prompt, image],
+                [prompt, {"mime_type": mime_type, "data": image_data}],
                 generation_config=generation_config
             )
-            
+
             return response.text
-            
-        except ImportError:
-            raise ImportError("请安装 Pillow: pip install Pillow")
+
         except Exception as e:
             logger.error(f"Gemini 多模态API调用失败: {e}")
             raise
-    
-    def is_available(self) -> bool:
+
+    def _probe_available(self) -> bool:
         """检查Gemini API是否可用"""
         if not self.api_key:
             logger.warning("未配置 GEMINI_API_KEY")
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+本地模型适配器（llama-cpp-python）
+
+在进程内直接运行量化GGUF模型（如Qwen2.5-0.5B Q4_K_M），
+无网络往返、无每张发票的API成本，适合离线批量处理
+"""
+
+import os
+import logging
+import threading
+from typing import Optional
+
+from .base_adapter import BaseLLMAdapter
+
+logger = logging.getLogger(__name__)
+
+# 模型实例缓存：同一模型文件只加载一次（加载耗时数秒且占用数百MB内存）
+_MODEL_CACHE = {}
+_MODEL_LOCK = threading.Lock()
+
+
+def _get_model(model_path: str, n_ctx: int):
+    """获取（或加载）指定路径的Llama模型单例"""
+    model = _MODEL_CACHE.get(model_path)
+    if model is not None:
+        return model
+
+    with _MODEL_LOCK:
+        # 双重检查，避免并发线程重复加载同一模型
+        model = _MODEL_CACHE.get(model_path)
+        if model is None:
+            try:
+                from llama_cpp import Llama
+            except ImportError:
+                raise ImportError("请安装 llama-cpp-python: pip install llama-cpp-python")
+
+            logger.info(f"加载本地模型: {model_path}")
+            model = Llama(
+                model_path=model_path,
+                n_ctx=n_ctx,
+                n_threads=os.cpu_count(),
+                verbose=False,
+            )
+            _MODEL_CACHE[model_path] = model
+    return model
+
+
+class LocalLlamaAdapter(BaseLLMAdapter):
+    """本地llama.cpp模型适配器"""
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        model_path: Optional[str] = None,
+        n_ctx: int = 4096,
+        **kwargs
+    ):
+        """
+        初始化本地模型适配器
+
+        Args:
+            model_name: 模型名称（展示用，默认取模型文件名）
+            model_path: GGUF模型文件路径，为None时从配置读取
+            n_ctx: 上下文窗口大小
+        """
+        if model_path is None:
+            from ..config.settings import LOCAL_MODEL_PATH
+            model_path = LOCAL_MODEL_PATH
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        super().__init__(model_name or os.path.basename(model_path), **kwargs)
+
+    def _ensure_model(self):
+        """确保模型已加载（进程级单例）"""
+        return _get_model(self.model_path, self.n_ctx)
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        """
+        本地推理生成文本
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 可选参数
+                - temperature: 生成温度
+                - max_tokens: 最大生成token数
+
+        Returns:
+            模型生成的文本
+        """
+        model = self._ensure_model()
+
+        try:
+            result = model.create_completion(
+                prompt,
+                temperature=kwargs.get("temperature", 0.1),
+                max_tokens=kwargs.get("max_tokens", 2048),
+            )
+            return result["choices"][0]["text"]
+
+        except Exception as e:
+            logger.error(f"本地模型推理失败: {e}")
+            raise
+
+    def generate_with_image(self, prompt: str, image_path: str, **kwargs) -> str:
+        """纯文本本地模型不支持图片输入"""
+        raise NotImplementedError("本地文本模型不支持图片识别，请使用视觉适配器")
+
+    def _probe_available(self) -> bool:
+        """检查模型文件是否存在且llama_cpp可用"""
+        if not os.path.exists(self.model_path):
+            logger.warning(f"本地模型文件不存在: {self.model_path}")
+            return False
+        try:
+            self._ensure_model()
+            return True
+        except Exception:
+            return False
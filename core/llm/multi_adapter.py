@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+多端点负载均衡适配器
+
+将请求轮询分摊到多个API Key/端点上，批量处理时突破单Key的
+QPM限流；按指数滑动平均的失败率自动避开不健康的端点
+"""
+
+import asyncio
+import logging
+import threading
+from typing import List
+
+from .base_adapter import BaseLLMAdapter
+
+logger = logging.getLogger(__name__)
+
+# 失败率EWMA的平滑系数与避让阈值
+_EWMA_ALPHA = 0.2
+_FAILURE_THRESHOLD = 0.5
+
+
+class MultiEndpointAdapter(BaseLLMAdapter):
+    """多端点负载均衡适配器"""
+
+    def __init__(self, adapters: List[BaseLLMAdapter], **kwargs):
+        """
+        初始化多端点适配器
+
+        Args:
+            adapters: 子适配器列表（每个对应一个Key/端点）
+        """
+        if not adapters:
+            raise ValueError("至少需要一个子适配器")
+        super().__init__(adapters[0].model_name, **kwargs)
+        self._pool = list(adapters)
+        self._failure_rates = [0.0] * len(self._pool)
+        self._next_index = 0
+        self._lock = threading.Lock()
+
+    def _pick(self) -> int:
+        """轮询选择下一个端点，跳过失败率过高的（全坏时仍然轮询）"""
+        with self._lock:
+            for _ in range(len(self._pool)):
+                index = self._next_index
+                self._next_index = (self._next_index + 1) % len(self._pool)
+                if self._failure_rates[index] <= _FAILURE_THRESHOLD:
+                    return index
+            # 所有端点都不健康，按轮询顺序硬选一个
+            index = self._next_index
+            self._next_index = (self._next_index + 1) % len(self._pool)
+            return index
+
+    def _record(self, index: int, failed: bool):
+        """按EWMA更新端点失败率"""
+        with self._lock:
+            rate = self._failure_rates[index]
+            self._failure_rates[index] = (
+                rate * (1 - _EWMA_ALPHA) + (_EWMA_ALPHA if failed else 0.0)
+            )
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        """轮询一个端点发送文本请求"""
+        index = self._pick()
+        try:
+            response = self._pool[index].generate(prompt, **kwargs)
+        except Exception:
+            self._record(index, failed=True)
+            raise
+        self._record(index, failed=False)
+        return response
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """轮询一个端点异步发送文本请求"""
+        index = self._pick()
+        try:
+            response = await self._pool[index].agenerate(prompt, **kwargs)
+        except Exception:
+            self._record(index, failed=True)
+            raise
+        self._record(index, failed=False)
+        return response
+
+    def generate_with_image(self, prompt: str, image_path: str, **kwargs) -> str:
+        """轮询一个端点发送图片+文本请求"""
+        index = self._pick()
+        try:
+            response = self._pool[index].generate_with_image(prompt, image_path, **kwargs)
+        except Exception:
+            self._record(index, failed=True)
+            raise
+        self._record(index, failed=False)
+        return response
+
+    def _probe_available(self) -> bool:
+        """任一端点可用即视为可用"""
+        return any(adapter.is_available() for adapter in self._pool)
@@ -6,15 +6,40 @@ Ollama 本地模型适配器
 """
 
 import os
-import base64
+import mmap
 import logging
 import requests
-from typing import Optional
+from typing import Iterator, Optional
 
-from .base_adapter import BaseLLMAdapter
+from .base_adapter import BaseLLMAdapter, encode_image_data
+from ..config.settings import OLLAMA_KEEP_ALIVE
 
 logger = logging.getLogger(__name__)
 
+# 可选的orjson：流式NDJSON逐行解析时每行都要过一次loads
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+# 可选的httpx：异步路径用原生AsyncClient并发请求Ollama，
+# 连接池复用单一keep-alive连接；未安装时回退到线程池包装的同步调用
+try:
+    import httpx as _httpx
+except ImportError:
+    _httpx = None
+
+# 连接失败的异常类型（TCP路径来自requests，UDS路径来自httpx）
+_CONNECT_ERRORS = (requests.exceptions.ConnectionError,)
+if _httpx is not None:
+    _CONNECT_ERRORS = _CONNECT_ERRORS + (_httpx.ConnectError,)
+
+# Ollama Unix域套接字的默认路径（Ollama需以
+# OLLAMA_HOST=unix:///var/run/ollama.sock 启动；可用OLLAMA_UDS覆盖）
+_DEFAULT_UDS_PATH = "/var/run/ollama.sock"
+
+_LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
 
 class OllamaAdapter(BaseLLMAdapter):
     """Ollama 本地模型适配器"""
@@ -28,7 +53,78 @@ class OllamaAdapter(BaseLLMAdapter):
         super().__init__(model_name, **kwargs)
         self.base_url = base_url.rstrip("/")
         self.timeout = kwargs.get("timeout", 120)  # 本地模型可能较慢
-        
+
+        # localhost且存在Unix域套接字时走UDS，绕开TCP环回栈的
+        # 每请求握手/校验开销（本地服务吞吐的主要系统调用成本）
+        self._uds_path = None
+        if _httpx is not None and self._is_localhost(self.base_url):
+            uds_path = os.environ.get("OLLAMA_UDS", _DEFAULT_UDS_PATH)
+            if os.path.exists(uds_path):
+                self._uds_path = uds_path
+
+        if self._uds_path:
+            self._session = _httpx.Client(
+                transport=_httpx.HTTPTransport(uds=self._uds_path, retries=3),
+                timeout=self.timeout,
+            )
+            logger.info(f"Ollama使用Unix域套接字: {self._uds_path}")
+        else:
+            # 持久Session：HTTP keep-alive复用TCP连接，批量请求免去逐次握手；
+            # 瞬态网关错误自动退避重试
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=32,
+                pool_maxsize=32,
+                max_retries=requests.adapters.Retry(
+                    total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504]
+                ),
+            )
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+
+        # httpx异步客户端（惰性创建）
+        self._async_client = None
+
+    @staticmethod
+    def _is_localhost(base_url: str) -> bool:
+        """判断base_url是否指向本机"""
+        from urllib.parse import urlparse
+        return urlparse(base_url).hostname in _LOCAL_HOSTS
+
+    def _build_payload(self, prompt: str, **kwargs) -> dict:
+        """构造 /api/generate 请求体"""
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": False,
+            # 批处理期间让模型权重常驻显存/内存，免去逐请求的加载开销
+            "keep_alive": kwargs.get("keep_alive", OLLAMA_KEEP_ALIVE),
+            "options": {
+                "temperature": kwargs.get("temperature", 0.1),
+                "num_predict": kwargs.get("num_predict", 2048),
+            }
+        }
+        # 传入schema时启用JSON约束解码，保证返回合法JSON
+        if kwargs.get("response_schema"):
+            payload["format"] = "json"
+        return payload
+
+    def _ensure_async_client(self):
+        """确保httpx异步客户端已初始化"""
+        if self._async_client is None:
+            if self._uds_path:
+                self._async_client = _httpx.AsyncClient(
+                    base_url=self.base_url,
+                    transport=_httpx.AsyncHTTPTransport(uds=self._uds_path),
+                    timeout=self.timeout,
+                )
+            else:
+                self._async_client = _httpx.AsyncClient(
+                    base_url=self.base_url,
+                    limits=_httpx.Limits(max_connections=32, max_keepalive_connections=32),
+                    timeout=self.timeout,
+                )
+
     def generate(self, prompt: str, **kwargs) -> str:
         """
         发送文本请求到Ollama
@@ -44,29 +140,100 @@ class OllamaAdapter(BaseLLMAdapter):
         """
         try:
             url = f"{self.base_url}/api/generate"
-            
-            payload = {
-                "model": self.model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": kwargs.get("temperature", 0.1),
-                    "num_predict": kwargs.get("num_predict", 2048),
-                }
-            }
-            
-            response = requests.post(url, json=payload, timeout=self.timeout)
+            payload = self._build_payload(prompt, **kwargs)
+
+            response = self._session.post(url, json=payload, timeout=self.timeout)
             response.raise_for_status()
             
             result = response.json()
             return result.get("response", "")
             
-        except requests.exceptions.ConnectionError:
+        except _CONNECT_ERRORS:
             logger.error(f"无法连接到Ollama服务: {self.base_url}")
             raise ConnectionError(f"Ollama服务未运行，请启动: ollama serve")
         except Exception as e:
             logger.error(f"Ollama API调用失败: {e}")
             raise
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """
+        流式发送文本请求到Ollama，逐块产出增量文本
+
+        Ollama流式返回NDJSON，逐行取response字段。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 可选参数
+
+        Yields:
+            模型生成的文本增量
+        """
+        url = f"{self.base_url}/api/generate"
+        payload = self._build_payload(prompt, **kwargs)
+        payload["stream"] = True
+
+        try:
+            if self._uds_path:
+                # httpx客户端的流式接口是上下文管理器
+                with self._session.stream("POST", url, json=payload) as response:
+                    response.raise_for_status()
+                    yield from self._iter_ndjson(response.iter_lines())
+            else:
+                response = self._session.post(
+                    url, json=payload, timeout=self.timeout, stream=True
+                )
+                response.raise_for_status()
+                yield from self._iter_ndjson(response.iter_lines())
+
+        except _CONNECT_ERRORS:
+            logger.error(f"无法连接到Ollama服务: {self.base_url}")
+            raise ConnectionError(f"Ollama服务未运行，请启动: ollama serve")
+        except Exception as e:
+            logger.error(f"Ollama 流式API调用失败: {e}")
+            raise
+
+    @staticmethod
+    def _iter_ndjson(lines) -> Iterator[str]:
+        """逐行解析流式NDJSON响应，产出response增量"""
+        for line in lines:
+            if not line:
+                continue
+            obj = _loads(line)
+            piece = obj.get("response")
+            if piece:
+                yield piece
+            if obj.get("done"):
+                break
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """
+        异步发送文本请求到Ollama
+
+        httpx可用时走原生异步客户端（单事件循环内并发多请求，
+        复用keep-alive连接池）；否则回退到线程池包装的同步调用。
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 可选参数
+
+        Returns:
+            模型生成的文本
+        """
+        if _httpx is None:
+            return await super().agenerate(prompt, **kwargs)
+
+        self._ensure_async_client()
+
+        try:
+            response = await self._async_client.post(
+                "/api/generate", json=self._build_payload(prompt, **kwargs)
+            )
+            response.raise_for_status()
+            return response.json().get("response", "")
+
+        except Exception as e:
+            logger.error(f"Ollama 异步API调用失败: {e}")
+            raise
     
     def generate_with_image(self, prompt: str, image_path: str, **kwargs) -> str:
         """
@@ -80,49 +247,74 @@ class OllamaAdapter(BaseLLMAdapter):
         Returns:
             模型生成的文本
         """
+        # mmap映射文件直接喂给base64编码器，省去f.read()的整份内存拷贝
+        # （Ollama API只接受JSON内嵌base64，无法完全绕开编码）
         try:
-            url = f"{self.base_url}/api/generate"
-            
-            # 读取并编码图片
             with open(image_path, "rb") as f:
-                image_data = base64.b64encode(f.read()).decode("utf-8")
-            
-            # 确定图片MIME类型
-            ext = os.path.splitext(image_path)[1].lower()
-            mime_types = {
-                ".jpg": "image/jpeg",
-                ".jpeg": "image/jpeg",
-                ".png": "image/png",
-                ".gif": "image/gif",
-                ".webp": "image/webp",
-            }
-            
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    encoded = encode_image_data(mm)
+        except (ValueError, OSError):
+            # 空文件或不支持mmap的文件系统，回退到普通读取
+            with open(image_path, "rb") as f:
+                encoded = encode_image_data(f.read())
+
+        return self._generate_with_encoded_image(prompt, encoded, **kwargs)
+
+    def generate_with_image_bytes(
+        self, prompt: str, image_data: bytes, mime_type: str = "image/png", **kwargs
+    ) -> str:
+        """
+        多模态：发送内存图片数据+文本请求
+
+        Args:
+            prompt: 输入提示词
+            image_data: 图片二进制数据
+            mime_type: 图片MIME类型（Ollama只需base64数据，此参数保留接口一致性）
+            **kwargs: 可选参数
+
+        Returns:
+            模型生成的文本
+        """
+        return self._generate_with_encoded_image(prompt, encode_image_data(image_data), **kwargs)
+
+    def generate_with_image_encoded(
+        self, prompt: str, mime_type: str, encoded: str, **kwargs
+    ) -> str:
+        """多模态：直接发送预编码的base64图片（Ollama不需要MIME类型）"""
+        return self._generate_with_encoded_image(prompt, encoded, **kwargs)
+
+    def _generate_with_encoded_image(self, prompt: str, encoded: str, **kwargs) -> str:
+        """发送已base64编码的图片+文本请求"""
+        try:
+            url = f"{self.base_url}/api/generate"
+
             payload = {
                 "model": self.model_name,
                 "prompt": prompt,
                 "stream": False,
-                "images": [image_data],
+                "keep_alive": kwargs.get("keep_alive", OLLAMA_KEEP_ALIVE),
+                "images": [encoded],
                 "options": {
                     "temperature": kwargs.get("temperature", 0.1),
                     "num_predict": kwargs.get("num_predict", 2048),
                 }
             }
-            
-            response = requests.post(url, json=payload, timeout=self.timeout)
+
+            response = self._session.post(url, json=payload, timeout=self.timeout)
             response.raise_for_status()
-            
+
             result = response.json()
             return result.get("response", "")
-            
+
         except Exception as e:
             logger.error(f"Ollama 多模态API调用失败: {e}")
             raise
     
-    def is_available(self) -> bool:
+    def _probe_available(self) -> bool:
         """检查Ollama服务是否可用"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.ok:
+            response = self._session.get(f"{self.base_url}/api/tags", timeout=5)
+            if response.status_code == 200:
                 # 检查模型是否已下载
                 models = response.json().get("models", [])
                 model_names = [m.get("name", "") for m in models]
@@ -135,12 +327,22 @@ class OllamaAdapter(BaseLLMAdapter):
             return False
     
     def list_models(self) -> list:
-        """列出Ollama中可用的模型"""
+        """列出Ollama中可用的模型（结果按PROBE_TTL缓存）"""
+        import time
+
+        now = time.monotonic()
+        cached = getattr(self, "_models_cache", None)
+        if cached is not None and now - cached[0] < self.PROBE_TTL:
+            return cached[1]
+
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.ok:
-                models = response.json().get("models", [])
-                return [m.get("name", "") for m in models]
-            return []
+            response = self._session.get(f"{self.base_url}/api/tags", timeout=5)
+            if response.status_code == 200:
+                models = [m.get("name", "") for m in response.json().get("models", [])]
+            else:
+                models = []
         except Exception:
-            return []
+            models = []
+
+        self._models_cache = (now, models)
+        return models
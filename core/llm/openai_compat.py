@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+OpenAI兼容API适配器基类
+
+OpenAI和DeepSeek（以及任何OpenAI协议兼容服务）共用openai SDK和
+完全相同的chat.completions调用逻辑，集中在此实现一份，
+缓存/异步/编码等优化只需在一处生效
+"""
+
+import os
+import logging
+from typing import Iterator, Optional
+
+from .base_adapter import (
+    BaseLLMAdapter, compress_image, encode_image_data, encode_image_file,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAICompatibleAdapter(BaseLLMAdapter):
+    """OpenAI兼容chat.completions适配器基类"""
+
+    # 子类覆盖：日志/错误信息中的提供商名称
+    PROVIDER_LABEL = "OpenAI"
+    # 子类覆盖：API Key的环境变量名
+    API_KEY_ENV = "OPENAI_API_KEY"
+    # 子类覆盖：API端点环境变量名及默认值（None表示使用SDK默认端点）
+    BASE_URL_ENV: Optional[str] = None
+    DEFAULT_BASE_URL: Optional[str] = None
+
+    def __init__(
+        self,
+        model_name: str,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        **kwargs
+    ):
+        super().__init__(model_name, **kwargs)
+        self.api_key = api_key or os.environ.get(self.API_KEY_ENV, "")
+        if base_url is None and self.BASE_URL_ENV:
+            base_url = os.environ.get(self.BASE_URL_ENV, self.DEFAULT_BASE_URL)
+        self.base_url = base_url
+        self._client = None
+        self._async_client = None
+
+    def _ensure_client(self):
+        """确保客户端已初始化"""
+        if self._client is None:
+            try:
+                from openai import OpenAI
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+                logger.info(f"{self.PROVIDER_LABEL}客户端初始化成功，模型：{self.model_name}")
+            except ImportError:
+                raise ImportError("请安装 openai: pip install openai")
+            except Exception as e:
+                logger.error(f"{self.PROVIDER_LABEL}客户端初始化失败: {e}")
+                raise
+
+    def _ensure_async_client(self):
+        """确保异步客户端已初始化"""
+        if self._async_client is None:
+            try:
+                from openai import AsyncOpenAI
+                self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+            except ImportError:
+                raise ImportError("请安装 openai: pip install openai")
+            except Exception as e:
+                logger.error(f"{self.PROVIDER_LABEL}异步客户端初始化失败: {e}")
+                raise
+
+    @staticmethod
+    def _response_format(kwargs) -> dict:
+        """根据response_schema参数构造结构化输出请求参数
+
+        传入JSON Schema时约束模型直接返回合法JSON，
+        省去响应侧的围栏剥离和格式修复。
+        """
+        response_schema = kwargs.get("response_schema")
+        if not response_schema:
+            return {}
+        return {
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "invoice_info",
+                    "strict": True,
+                    "schema": response_schema,
+                },
+            }
+        }
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        """
+        发送文本请求
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 可选参数
+
+        Returns:
+            模型生成的文本
+        """
+        self._ensure_client()
+
+        try:
+            response = self._client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=kwargs.get("temperature", 0.1),
+                max_tokens=kwargs.get("max_tokens", 2048),
+                **self._response_format(kwargs),
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            logger.error(f"{self.PROVIDER_LABEL} API调用失败: {e}")
+            raise
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """
+        流式发送文本请求，逐块产出增量文本
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 可选参数
+
+        Yields:
+            模型生成的文本增量
+        """
+        self._ensure_client()
+
+        try:
+            response = self._client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=kwargs.get("temperature", 0.1),
+                max_tokens=kwargs.get("max_tokens", 2048),
+                stream=True,
+            )
+
+            for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+
+        except Exception as e:
+            logger.error(f"{self.PROVIDER_LABEL} 流式API调用失败: {e}")
+            raise
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """
+        异步发送文本请求（用于并发批处理）
+
+        Args:
+            prompt: 输入提示词
+            **kwargs: 可选参数
+
+        Returns:
+            模型生成的文本
+        """
+        self._ensure_async_client()
+
+        try:
+            response = await self._async_client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=kwargs.get("temperature", 0.1),
+                max_tokens=kwargs.get("max_tokens", 2048),
+                **self._response_format(kwargs),
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            logger.error(f"{self.PROVIDER_LABEL} 异步API调用失败: {e}")
+            raise
+
+    def generate_with_image(self, prompt: str, image_path: str, **kwargs) -> str:
+        """
+        多模态：发送图片+文本请求
+
+        Args:
+            prompt: 输入提示词
+            image_path: 图片文件路径
+            **kwargs: 可选参数
+
+        Returns:
+            模型生成的文本
+        """
+        # 走缓存编码路径：同一文件重复发送时复用base64结果
+        mime_type, encoded = encode_image_file(image_path)
+        return self._generate_with_encoded_image(prompt, encoded, mime_type, **kwargs)
+
+    def generate_with_image_bytes(
+        self, prompt: str, image_data: bytes, mime_type: str = "image/png", **kwargs
+    ) -> str:
+        """
+        多模态：发送内存图片数据+文本请求（base64数据URL）
+
+        Args:
+            prompt: 输入提示词
+            image_data: 图片二进制数据
+            mime_type: 图片MIME类型
+            **kwargs: 可选参数
+
+        Returns:
+            模型生成的文本
+        """
+        image_data, mime_type = compress_image(image_data, mime_type)
+        return self._generate_with_encoded_image(
+            prompt, encode_image_data(image_data), mime_type, **kwargs
+        )
+
+    def generate_with_image_encoded(
+        self, prompt: str, mime_type: str, encoded: str, **kwargs
+    ) -> str:
+        """多模态：直接发送预编码的base64图片（零拷贝路径）"""
+        return self._generate_with_encoded_image(prompt, encoded, mime_type, **kwargs)
+
+    def _generate_with_encoded_image(
+        self, prompt: str, encoded: str, mime_type: str, **kwargs
+    ) -> str:
+        """发送已base64编码的图片+文本请求（data URL形式）"""
+        self._ensure_client()
+
+        try:
+            response = self._client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt},
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:{mime_type};base64,{encoded}"
+                                }
+                            }
+                        ]
+                    }
+                ],
+                temperature=kwargs.get("temperature", 0.1),
+                max_tokens=kwargs.get("max_tokens", 2048),
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            logger.error(f"{self.PROVIDER_LABEL} 多模态API调用失败: {e}")
+            raise
+
+    def _probe_available(self) -> bool:
+        """检查API是否可用"""
+        if not self.api_key:
+            logger.warning(f"未配置 {self.API_KEY_ENV}")
+            return False
+        try:
+            self._ensure_client()
+            return True
+        except Exception:
+            return False
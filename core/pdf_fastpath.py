@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+PDF文本提取快速路径
+
+pdfplumber的extract_text把大部分时间花在逐字符几何比较的纯Python
+聚类循环上。这里把该数值内核搬进Numba JIT编译的函数：字符坐标
+一次性转成NumPy数组交给机器码循环，Python侧只剩按聚类结果拼接
+文本。未安装numba（可选依赖）或聚类失败时回退pdfplumber原生实现，
+提取结果不受影响。
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numba as _numba
+    import numpy as _np
+except ImportError:
+    _numba = None
+    _np = None
+
+# 行/词聚类容差（pt），与pdfplumber的默认容差对齐
+Y_TOLERANCE = 3.0
+X_TOLERANCE = 3.0
+
+if _numba is not None:
+
+    @_numba.njit(cache=True)
+    def _cluster_chars(tops, x0s, x1s):  # pragma: no cover - 需numba环境
+        """
+        为按(top, x0)排序的字符分配行号并标记词间隔
+
+        Args:
+            tops: 字符上沿y坐标（已排序）
+            x0s: 字符左沿x坐标
+            x1s: 字符右沿x坐标
+
+        Returns:
+            (每个字符的行号int32数组, 与前一字符间需插空格的uint8数组)
+        """
+        n = tops.shape[0]
+        lines = _np.zeros(n, dtype=_np.int32)
+        spaces = _np.zeros(n, dtype=_np.uint8)
+        line_id = 0
+        for i in range(1, n):
+            if tops[i] - tops[i - 1] > Y_TOLERANCE:
+                line_id += 1
+            elif x0s[i] - x1s[i - 1] > X_TOLERANCE:
+                spaces[i] = 1
+            lines[i] = line_id
+        return lines, spaces
+
+
+def extract_page_text(page) -> str:
+    """
+    提取单页文本：numba可用时走JIT聚类，否则pdfplumber原生实现
+
+    Args:
+        page: pdfplumber的Page对象
+
+    Returns:
+        该页文本
+    """
+    if _numba is None:
+        return page.extract_text()
+
+    try:
+        chars = page.chars
+        if not chars:
+            return ""
+
+        order = sorted(
+            range(len(chars)), key=lambda i: (chars[i]["top"], chars[i]["x0"])
+        )
+        tops = _np.array([chars[i]["top"] for i in order], dtype=_np.float64)
+        x0s = _np.array([chars[i]["x0"] for i in order], dtype=_np.float64)
+        x1s = _np.array([chars[i]["x1"] for i in order], dtype=_np.float64)
+        lines, spaces = _cluster_chars(tops, x0s, x1s)
+
+        parts = []
+        prev_line = 0
+        for pos, i in enumerate(order):
+            if lines[pos] != prev_line:
+                parts.append("\n")
+                prev_line = lines[pos]
+            elif spaces[pos]:
+                parts.append(" ")
+            parts.append(chars[i]["text"])
+        return "".join(parts)
+    except Exception as e:
+        logger.debug(f"JIT字符聚类失败，回退pdfplumber原生提取: {e}")
+        return page.extract_text()
@@ -8,12 +8,53 @@
 import os
 import json
 import logging
+import functools
+import itertools
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Set
+from typing import Iterable, List, Dict, Any, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 可选的orjson（C实现的JSON编解码，进度文件随已处理数线性增长时收益明显）
+# 未安装时回退到标准库json，文件格式完全兼容
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+
+def _dumps_state(state: Dict[str, Any]) -> bytes:
+    """序列化进度状态为带缩进的JSON字节串"""
+    if _orjson is not None:
+        return _orjson.dumps(state, option=_orjson.OPT_INDENT_2)
+    return json.dumps(state, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _dumps_line(record: Dict[str, Any]) -> str:
+    """序列化一条WAL记录（单行，无缩进）"""
+    if _orjson is not None:
+        return _orjson.dumps(record).decode('utf-8')
+    return json.dumps(record, ensure_ascii=False)
+
+
+def _loads(data) -> Any:
+    """反序列化JSON（接受str或bytes）"""
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=65536)
+def _normalize_path(file_path: str) -> str:
+    """标准化文件路径用于比较
+
+    abspath内部要取当前工作目录（一次系统调用）并分配新字符串；
+    同一路径在查找、记录和续传过滤中会反复归一化，按输入缓存结果。
+    模块级函数而非方法，避免lru_cache持有self引用。
+    """
+    return os.path.normpath(os.path.abspath(file_path)).replace('\\', '/')
+
 
 class ProgressManager:
     """
@@ -23,7 +64,11 @@ class ProgressManager:
     """
     
     PROGRESS_FILENAME = ".processing_progress.json"
-    
+    WAL_FILENAME = ".processing_progress.wal"
+
+    # 每追加多少条WAL记录做一次快照（重写完整JSON并清空WAL）
+    SNAPSHOT_EVERY = 256
+
     def __init__(self, output_folder: str):
         """
         初始化进度管理器
@@ -35,21 +80,26 @@ class ProgressManager:
         self.output_folder.mkdir(parents=True, exist_ok=True)
         
         self.progress_file = self.output_folder / self.PROGRESS_FILENAME
+        self.wal_file = self.output_folder / self.WAL_FILENAME
+
+        # WAL句柄惰性打开（行缓冲追加模式）
+        self._wal = None
+        self._appends_since_snapshot = 0
+
         
-        # 进度状态
+        # 进度状态（文件列表不在此重复保存，
+        # 集合为唯一内存副本，序列化时再物化为有序列表）
         self._state: Dict[str, Any] = {
             "source_folder": "",
             "output_folder": str(self.output_folder),
             "total_files": 0,
-            "processed_files": [],  # 已成功处理的文件路径列表
-            "failed_files": [],     # 处理失败的文件路径列表
             "start_time": None,
             "last_update": None,
             "completed": False,
             "settings": {}
         }
         
-        # 用于快速查找的集合
+        # 已处理/失败文件集合（O(1)查找，内存中的唯一数据源）
         self._processed_set: Set[str] = set()
         self._failed_set: Set[str] = set()
     
@@ -67,6 +117,10 @@ class ProgressManager:
     def total_files(self) -> int:
         """总文件数"""
         return self._state.get("total_files", 0)
+
+    def set_total_files(self, total: int):
+        """回填总文件数（流水线扫描模式下初始化时总数未知）"""
+        self._state["total_files"] = total
     
     def has_existing_progress(self) -> bool:
         """检查是否存在未完成的进度"""
@@ -74,8 +128,7 @@ class ProgressManager:
             return False
         
         try:
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                state = json.load(f)
+            state = _loads(self.progress_file.read_bytes())
             return not state.get("completed", True)
         except Exception:
             return False
@@ -92,13 +145,15 @@ class ProgressManager:
             return False
         
         try:
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                self._state = json.load(f)
-            
-            # 重建查找集合
-            self._processed_set = set(self._state.get("processed_files", []))
-            self._failed_set = set(self._state.get("failed_files", []))
+            self._state = _loads(self.progress_file.read_bytes())
             
+            # 列表只存在于磁盘格式中，加载后物化为集合
+            self._processed_set = set(self._state.pop("processed_files", []))
+            self._failed_set = set(self._state.pop("failed_files", []))
+
+            # 回放快照之后追加的WAL记录
+            self._replay_wal()
+
             logger.info(f"已加载进度: {self.processed_count}/{self.total_files} 文件已处理")
             return True
             
@@ -124,8 +179,6 @@ class ProgressManager:
             "source_folder": source_folder,
             "output_folder": str(self.output_folder),
             "total_files": total_files,
-            "processed_files": [],
-            "failed_files": [],
             "start_time": datetime.now().isoformat(),
             "last_update": datetime.now().isoformat(),
             "completed": False,
@@ -134,8 +187,8 @@ class ProgressManager:
         
         self._processed_set = set()
         self._failed_set = set()
-        
-        self._save()
+
+        self._snapshot()
         logger.info(f"初始化新进度: 共 {total_files} 个文件待处理")
     
     def is_processed(self, file_path: str) -> bool:
@@ -159,35 +212,58 @@ class ProgressManager:
             file_path: 文件路径
             success: 是否处理成功
         """
-        normalized = self._normalize_path(file_path)
-        
-        if success:
-            if normalized not in self._processed_set:
+        self.add_processed_batch([(file_path, success)])
+
+    def add_processed_batch(self, items: Iterable[Tuple[str, bool]]):
+        """
+        批量添加已处理的文件
+
+        一次遍历更新内存集合后，合并为单次WAL写入，
+        供流水线按批次缓冲完成记录以减少写系统调用次数。
+
+        Args:
+            items: (文件路径, 是否成功) 的可迭代对象
+        """
+        lines = []
+        for file_path, success in items:
+            normalized = self._normalize_path(file_path)
+
+            if success:
                 self._processed_set.add(normalized)
-                self._state["processed_files"].append(normalized)
-        else:
-            if normalized not in self._failed_set:
+            else:
                 self._failed_set.add(normalized)
-                self._state["failed_files"].append(normalized)
-        
+
+            lines.append(_dumps_line({"p": normalized, "ok": success}))
+
+        if not lines:
+            return
+
         self._state["last_update"] = datetime.now().isoformat()
-        self._save()
+
+        # 整批一次写入WAL（O(1)次系统调用），定期快照重写完整JSON
+        # 避免每个文件都整体重写进度文件导致的O(N^2)写放大
+        self._wal_append_lines(lines)
+        if self._appends_since_snapshot >= self.SNAPSHOT_EVERY:
+            self._snapshot()
     
     def mark_completed(self):
         """标记处理完成"""
         self._state["completed"] = True
         self._state["last_update"] = datetime.now().isoformat()
-        self._save()
+        self._snapshot()
         logger.info("处理已完成，进度已保存")
     
     def clear_progress(self):
         """清除进度文件"""
-        if self.progress_file.exists():
-            try:
-                self.progress_file.unlink()
-                logger.info("进度文件已清除")
-            except Exception as e:
-                logger.warning(f"清除进度文件失败: {e}")
+        self._close_wal()
+        for path in (self.progress_file, self.wal_file):
+            if path.exists():
+                try:
+                    path.unlink()
+                except Exception as e:
+                    logger.warning(f"清除进度文件失败: {e}")
+                    return
+        logger.info("进度文件已清除")
     
     def get_pending_files(self, all_files: List[str]) -> List[str]:
         """
@@ -199,11 +275,7 @@ class ProgressManager:
         Returns:
             待处理的文件列表
         """
-        pending = []
-        for file_path in all_files:
-            normalized = self._normalize_path(file_path)
-            if normalized not in self._processed_set:
-                pending.append(file_path)
+        pending = list(itertools.filterfalse(self.is_processed, all_files))
         
         skipped = len(all_files) - len(pending)
         if skipped > 0:
@@ -223,14 +295,77 @@ class ProgressManager:
             "last_update": self._state.get("last_update")
         }
     
-    def _normalize_path(self, file_path: str) -> str:
-        """标准化文件路径用于比较"""
-        return os.path.normpath(os.path.abspath(file_path)).replace('\\', '/')
+    # 模块级缓存版本（见 _normalize_path 函数）
+    _normalize_path = staticmethod(_normalize_path)
     
     def _save(self):
-        """保存进度到文件"""
+        """保存进度到文件（先写临时文件再原子替换，中断不会损坏快照）"""
+        tmp_file = self.progress_file.with_suffix('.tmp')
+        # 序列化时才物化有序列表（磁盘格式与旧版兼容）
+        state = dict(
+            self._state,
+            processed_files=sorted(self._processed_set),
+            failed_files=sorted(self._failed_set),
+        )
         try:
-            with open(self.progress_file, 'w', encoding='utf-8') as f:
-                json.dump(self._state, f, ensure_ascii=False, indent=2)
+            with open(tmp_file, 'wb') as f:
+                f.write(_dumps_state(state))
+            os.replace(tmp_file, self.progress_file)
         except Exception as e:
             logger.error(f"保存进度失败: {e}")
+
+    def _wal_append_lines(self, lines: List[str]):
+        """向WAL追加一批处理记录（单次write调用）"""
+        try:
+            if self._wal is None:
+                # 行缓冲：每条记录写完即落到操作系统，无需显式flush
+                self._wal = open(self.wal_file, 'a', encoding='utf-8', buffering=1)
+            self._wal.write("\n".join(lines) + "\n")
+            self._appends_since_snapshot += len(lines)
+        except Exception as e:
+            logger.error(f"写入进度WAL失败: {e}")
+
+    def _replay_wal(self):
+        """将快照之后的WAL记录合并进内存状态"""
+        if not self.wal_file.exists():
+            return
+        try:
+            with open(self.wal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = _loads(line)
+                    except ValueError:
+                        # 中断时可能留下半行记录，跳过
+                        continue
+                    normalized = record.get("p")
+                    if not normalized:
+                        continue
+                    if record.get("ok"):
+                        self._processed_set.add(normalized)
+                    else:
+                        self._failed_set.add(normalized)
+        except Exception as e:
+            logger.error(f"回放进度WAL失败: {e}")
+
+    def _close_wal(self):
+        """关闭WAL句柄"""
+        if self._wal is not None:
+            try:
+                self._wal.close()
+            except Exception:
+                pass
+            self._wal = None
+
+    def _snapshot(self):
+        """重写完整进度JSON并清空WAL"""
+        self._save()
+        self._close_wal()
+        try:
+            if self.wal_file.exists():
+                self.wal_file.unlink()
+        except Exception as e:
+            logger.warning(f"清空进度WAL失败: {e}")
+        self._appends_since_snapshot = 0
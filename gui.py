@@ -7,18 +7,51 @@
 
 import os
 import sys
+import queue
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
+from dataclasses import dataclass
 from pathlib import Path
 
+
+@dataclass(frozen=True)
+class RunConfig:
+    """一次处理运行的配置快照
+
+    工作线程入口处从Tk变量一次性取齐，此后线程内不再碰Tcl解释器
+    （每次StringVar.get()都要跨线程取Tcl锁，与主循环串行）。
+    """
+    provider: str
+    model: str
+    source: str
+    output: str
+    extraction_mode: str
+    use_multithread: bool
+    thread_count: int
+    ollama_url: str
+    ollama_text_model: str
+    ollama_vision_model: str
+    resume: bool
+    batch_size: int
+    prompt_cache: bool
+
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 
 class InvoiceGUI:
     """发票管理系统V2图形界面"""
-    
+
+    # 提供商 -> (模型列表, 是否使用Ollama双模型界面)
+    # 新增提供商只需在此加一行，无需改动切换逻辑
+    PROVIDERS = {
+        "gemini": (["gemini-2.5-flash", "gemini-2.5-pro", "gemini-2.0-flash"], False),
+        "deepseek": (["deepseek-chat", "deepseek-reasoner"], False),
+        "openai": (["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo"], False),
+        "ollama": (None, True),
+    }
+
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("发票管理系统 V2 - 大模型智能识别")
@@ -38,8 +71,14 @@ class InvoiceGUI:
         # Ollama 双模型配置
         self.ollama_text_model = tk.StringVar(value="")
         self.ollama_vision_model = tk.StringVar(value="")
+
+        # 日志队列：工作线程只入队，主循环定时批量取出后一次性插入，
+        # 避免每条日志都经过一次 after(0) 的跨线程Tk唤醒
+        self._log_queue = queue.SimpleQueue()
+        self.limit_log_buffer = tk.BooleanVar(value=True)
         self.resume_progress = tk.BooleanVar(value=False)
         self.batch_size = tk.StringVar(value="10")
+        self.enable_prompt_cache = tk.BooleanVar(value=True)
         self.processing = False
         
         self._create_widgets()
@@ -49,6 +88,31 @@ class InvoiceGUI:
         
         # 初始化模型列表
         self._on_provider_change()
+        
+        # 后台预热重量级模块导入，首次点击"检查LLM"/"开始处理"不再卡顿
+        threading.Thread(target=self._warm_imports, daemon=True).start()
+    
+    def _warm_imports(self):
+        """
+        后台线程预导入重量级依赖
+
+        工作线程里的惰性 import 让GUI启动保持轻快，但代价是用户的
+        第一次点击要付numpy/pandas/openpyxl等模块的冷导入成本
+        （可达秒级卡顿）。空闲的后台线程提前把它们灌进sys.modules，
+        后续的import退化为字典查找；并发导入由Python导入锁保证安全。
+        """
+        import importlib
+
+        for name in (
+            "core.llm", "core.extractors", "main_processor",
+            "numpy", "pandas", "openpyxl",
+        ):
+            try:
+                importlib.import_module(name)
+            except Exception:
+                # 缺失的可选依赖在真正使用处报错，预热阶段静默跳过
+                pass
+        self._log("已预加载模块")
     
     def _create_widgets(self):
         """创建界面控件"""
@@ -188,6 +252,14 @@ class InvoiceGUI:
         )
         self.resume_check.pack(side=tk.LEFT, padx=(10, 0))
         
+        # 提示缓存（云端提供商复用静态指令前缀的prefill）
+        self.prompt_cache_check = ttk.Checkbutton(
+            config_row2,
+            text="启用提示缓存",
+            variable=self.enable_prompt_cache
+        )
+        self.prompt_cache_check.pack(side=tk.LEFT, padx=(10, 0))
+        
         # 第三行：Ollama服务器设置（仅当选择Ollama时显示）
         self.ollama_config_frame = ttk.Frame(config_frame)
         # 初始不显示，待选择Ollama时才显示
@@ -234,13 +306,27 @@ class InvoiceGUI:
         )
         self.vision_model_combo.pack(side=tk.LEFT, padx=5)
         
-        # 刷新按钮
-        ttk.Button(
+        # 刷新按钮（Shift+点击强制绕过30秒的模型列表缓存）
+        refresh_button = ttk.Button(
             self.ollama_model_frame, 
             text="刷新模型", 
             command=self._refresh_ollama_models,
             width=10
-        ).pack(side=tk.LEFT, padx=(10, 0))
+        )
+        refresh_button.pack(side=tk.LEFT, padx=(10, 0))
+        refresh_button.bind(
+            "<Shift-Button-1>",
+            lambda event: self._refresh_ollama_models(force=True) or "break"
+        )
+        
+        # 量化建议提示
+        quant_hint = ttk.Label(
+            self.ollama_model_frame,
+            text="推荐 q4_K_M 量化以获得最佳速度",
+            font=("微软雅黑", 9),
+            foreground="gray"
+        )
+        quant_hint.pack(side=tk.LEFT, padx=(10, 0))
         
         # 多模态模型提示
         vision_hint = ttk.Label(
@@ -272,6 +358,12 @@ class InvoiceGUI:
         self.stop_button.pack(side=tk.LEFT, padx=5)
         
         ttk.Button(button_frame, text="清空日志", command=self._clear_log).pack(side=tk.RIGHT, padx=5)
+
+        ttk.Checkbutton(
+            button_frame,
+            text="限制日志缓冲 (5000 行)",
+            variable=self.limit_log_buffer
+        ).pack(side=tk.RIGHT, padx=5)
         
         # ===== 进度条 =====
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
@@ -314,43 +406,27 @@ class InvoiceGUI:
             self.output_folder.set(folder)
     
     def _on_provider_change(self, *args):
-        """提供商改变时更新模型列表"""
+        """提供商改变时更新模型列表（按PROVIDERS表分发，单一代码路径）"""
         provider = self.llm_provider.get()
-        
-        if provider == "gemini":
-            models = ["gemini-2.5-flash", "gemini-2.5-pro", "gemini-2.0-flash"]
-            self.model_combo['values'] = models
-            self.llm_model.set(models[0])
-            self.model_combo['state'] = 'readonly'
-            # 隐藏Ollama配置
-            self.ollama_config_frame.pack_forget()
-            self.ollama_model_frame.pack_forget()
-        elif provider == "deepseek":
-            # DeepSeek 模型列表
-            models = ["deepseek-chat", "deepseek-reasoner"]
-            self.model_combo['values'] = models
-            self.llm_model.set(models[0])
-            self.model_combo['state'] = 'readonly'
-            # 隐藏Ollama配置
-            self.ollama_config_frame.pack_forget()
-            self.ollama_model_frame.pack_forget()
-        elif provider == "openai":
-            models = ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo"]
+        entry = self.PROVIDERS.get(provider)
+        if entry is None:
+            return
+        models, ollama_ui = entry
+
+        if ollama_ui:
+            # 显示Ollama配置（服务器 + 双模型选择），禁用单模型选择
+            self.ollama_config_frame.pack(fill=tk.X, pady=(5, 0))
+            self.ollama_model_frame.pack(fill=tk.X, pady=(5, 0))
+            self.model_combo['state'] = 'disabled'
+            self.llm_model.set("（使用下方双模型）")
+            self._refresh_ollama_models()
+        else:
             self.model_combo['values'] = models
             self.llm_model.set(models[0])
             self.model_combo['state'] = 'readonly'
             # 隐藏Ollama配置
             self.ollama_config_frame.pack_forget()
             self.ollama_model_frame.pack_forget()
-        elif provider == "ollama":
-            # 显示Ollama配置（服务器 + 双模型选择）
-            self.ollama_config_frame.pack(fill=tk.X, pady=(5, 0))
-            self.ollama_model_frame.pack(fill=tk.X, pady=(5, 0))
-            # 隐藏单模型选择（对Ollama使用双模型选择）
-            self.model_combo['state'] = 'disabled'
-            self.llm_model.set("（使用下方双模型）")
-            # 刷新双模型列表
-            self._refresh_ollama_models()
     
     def _refresh_models(self):
         """刷新模型列表（云端API用）"""
@@ -364,34 +440,64 @@ class InvoiceGUI:
         # 其他提供商直接触发provider change
         self._on_provider_change()
     
-    def _refresh_ollama_models(self):
-        """刷新Ollama双模型列表"""
+    def _refresh_ollama_models(self, force: bool = False):
+        """刷新Ollama双模型列表
+
+        HTTP请求放到一次性后台线程，避免远程服务器慢响应时冻结
+        主循环；适配器侧带30秒TTL缓存，窗口期内的重复刷新不发请求。
+
+        Args:
+            force: 为True时绕过TTL缓存（Shift+点击刷新按钮）
+        """
         base_url = self._get_ollama_url()
         self._log(f"正在获取Ollama模型列表 ({base_url})...")
-        
+
+        def fetch():
+            try:
+                # 走进程级单例，刷新/切换时复用同一HTTP连接池
+                from core.llm import get_llm
+                adapter = get_llm("ollama", base_url=base_url)
+                if force and hasattr(adapter, "_models_cache"):
+                    del adapter._models_cache
+                models = adapter.list_models()
+            except Exception as e:
+                self._log(f"获取模型列表失败: {e}")
+                models = []
+            self.root.after(0, lambda: self._apply_ollama_models(models))
+
+        threading.Thread(target=fetch, daemon=True).start()
+
+    @staticmethod
+    def _pick_default_model(models: list, keywords: list) -> str:
+        """
+        按关键词挑选默认模型，同系列中优先q4量化变体
+
+        解码速度受权重/KV缓存的内存带宽限制，q4_K_M量化比fp16
+        小约4倍、出token快2-3倍，识别质量对发票字段提取足够。
+        """
+        candidates = [m for m in models if any(k in m.lower() for k in keywords)]
+        if not candidates:
+            return models[0]
+        return next((m for m in candidates if 'q4' in m.lower()), candidates[0])
+
+    def _apply_ollama_models(self, models: list):
+        """把获取到的模型列表应用到双模型下拉框（主循环内调用）"""
         try:
-            from core.llm import OllamaAdapter
-            adapter = OllamaAdapter(base_url=base_url)
-            models = adapter.list_models()
-            
             if models:
                 # 更新文本模型下拉框
                 self.text_model_combo['values'] = models
                 if not self.ollama_text_model.get() or self.ollama_text_model.get() not in models:
-                    # 优先选择 qwen 系列作为文本模型
-                    text_default = next((m for m in models if 'qwen' in m.lower()), models[0])
-                    self.ollama_text_model.set(text_default)
+                    # 优先选择 qwen 系列（q4量化优先）作为文本模型
+                    self.ollama_text_model.set(self._pick_default_model(models, ['qwen']))
                 
                 # 更新图片模型下拉框
                 self.vision_model_combo['values'] = models
                 if not self.ollama_vision_model.get() or self.ollama_vision_model.get() not in models:
-                    # 优先选择多模态模型（llava/bakllava/minicpm-v等）作为图片模型
+                    # 优先选择多模态模型（llava/bakllava/minicpm-v等，q4量化优先）作为图片模型
                     vision_keywords = ['llava', 'bakllava', 'minicpm', 'gemma3']
-                    vision_default = next(
-                        (m for m in models if any(k in m.lower() for k in vision_keywords)), 
-                        models[0]
+                    self.ollama_vision_model.set(
+                        self._pick_default_model(models, vision_keywords)
                     )
-                    self.ollama_vision_model.set(vision_default)
                 
                 self._log(f"找到 {len(models)} 个Ollama模型: {', '.join(models[:5])}{'...' if len(models) > 5 else ''}")
             else:
@@ -402,12 +508,7 @@ class InvoiceGUI:
                 self.ollama_vision_model.set("llava:7b")
                 self._log("未找到Ollama模型，请确保Ollama服务已启动")
         except Exception as e:
-            self._log(f"获取模型列表失败: {e}")
-            default_models = ["qwen2.5:7b", "llava:7b"]
-            self.text_model_combo['values'] = default_models
-            self.vision_model_combo['values'] = default_models
-            self.ollama_text_model.set("qwen2.5:7b")
-            self.ollama_vision_model.set("llava:7b")
+            self._log(f"更新模型列表失败: {e}")
     
     def _get_ollama_url(self) -> str:
         """获取当前配置的Ollama服务器URL"""
@@ -441,12 +542,12 @@ class InvoiceGUI:
         self._log("正在检查LLM可用性...")
         
         try:
-            from core.llm import LLMFactory
+            from core.llm import get_llm
             provider = self.llm_provider.get()
             model = self.llm_model.get()
             
             self._log(f"检查: {provider} / {model}")
-            adapter = LLMFactory.create(provider, model)
+            adapter = get_llm(provider, model or None)
             
             if adapter.is_available():
                 self._log(f"✓ {provider.upper()} 可用 ({adapter.model_name})")
@@ -480,71 +581,95 @@ class InvoiceGUI:
         """后台处理线程"""
         try:
             from main_processor import process_invoices
-            
-            provider = self.llm_provider.get()
-            model = self.llm_model.get()
-            source = self.source_folder.get()
-            output = self.output_folder.get()
-            
-            self._log(f"开始处理: {source}")
-            self._log(f"输出文件夹: {output}")
-            self._log(f"LLM提供商: {provider}")
-            self._log(f"提取模式: {self.extraction_mode.get()}")
+
+            # 一次性快照全部GUI状态，此后工作线程不再读Tk变量
+            use_multithread = self.enable_multithread.get()
+            cfg = RunConfig(
+                provider=self.llm_provider.get(),
+                model=self.llm_model.get(),
+                source=self.source_folder.get(),
+                output=self.output_folder.get(),
+                extraction_mode=self.extraction_mode.get(),
+                use_multithread=use_multithread,
+                thread_count=int(self.thread_count.get()) if use_multithread else 1,
+                ollama_url=self._get_ollama_url(),
+                ollama_text_model=self.ollama_text_model.get(),
+                ollama_vision_model=self.ollama_vision_model.get(),
+                resume=self.resume_progress.get(),
+                batch_size=int(self.batch_size.get()),
+                prompt_cache=self.enable_prompt_cache.get(),
+            )
+
+            # 提示缓存开关写回设置，各适配器在请求时读取
+            from core.config import settings
+            settings.PROMPT_CACHE_ENABLED = cfg.prompt_cache
+
+            self._log(f"开始处理: {cfg.source}")
+            self._log(f"输出文件夹: {cfg.output}")
+            self._log(f"LLM提供商: {cfg.provider}")
+            self._log(f"提取模式: {cfg.extraction_mode}")
             
             # Ollama服务器设置和双模型配置
             ollama_url = None
             ollama_text_model = None
             ollama_vision_model = None
-            if provider == "ollama":
-                ollama_url = self._get_ollama_url()
-                ollama_text_model = self.ollama_text_model.get()
-                ollama_vision_model = self.ollama_vision_model.get()
+            if cfg.provider == "ollama":
+                ollama_url = cfg.ollama_url
+                ollama_text_model = cfg.ollama_text_model
+                ollama_vision_model = cfg.ollama_vision_model
                 self._log(f"Ollama服务器: {ollama_url}")
                 self._log(f"文本模型: {ollama_text_model}")
                 self._log(f"图片模型: {ollama_vision_model}")
             else:
-                self._log(f"模型: {model}")
+                self._log(f"模型: {cfg.model}")
             
             # 多线程设置
-            use_multithread = self.enable_multithread.get()
-            thread_count = int(self.thread_count.get()) if use_multithread else 1
-            if use_multithread:
-                self._log(f"多线程: 启用 ({thread_count} 线程)")
+            if cfg.use_multithread:
+                self._log(f"多线程: 启用 ({cfg.thread_count} 线程)")
             else:
                 self._log("多线程: 禁用")
             self._log("-" * 50)
             
             # 断点续传和批处理设置
-            resume = self.resume_progress.get()
-            batch_size = int(self.batch_size.get())
-            if resume:
+            if cfg.resume:
                 self._log("继续上次进度: 启用")
-            self._log(f"批处理大小: {batch_size}")
+            self._log(f"批处理大小: {cfg.batch_size}")
             
             # 文件锁定回调（弹窗提示用户关闭Excel）
             def on_file_locked(message: str) -> bool:
                 import tkinter.messagebox as mb
                 return mb.askokcancel("文件被占用", message)
             
+            # 逐文件结果回调：边处理边输出识别结果，处理完即释放，
+            # 不再等全部结束后整体留存（峰值内存不随文件数增长）
+            def on_result(r):
+                if r.get("success"):
+                    info = r.get("info", {})
+                    filename = Path(r['file_path']).name
+                    seller = info.get('销售方名称') or '未识别'
+                    invoice_no = info.get('发票号码') or '未识别'
+                    self._log(f"✓ {filename}")
+                    self._log(f"  → 发票号: {invoice_no}, 销方: {seller[:20]}")
+
             # 调用处理函数
             result = process_invoices(
-                source_folder=source,
-                output_folder=output,
-                extraction_mode=self.extraction_mode.get(),
-                llm_provider=provider,
-                llm_model=model,
+                source_folder=cfg.source,
+                output_folder=cfg.output,
+                extraction_mode=cfg.extraction_mode,
+                llm_provider=cfg.provider,
+                llm_model=cfg.model,
                 generate_report=True,
                 classify_files=True,
-                max_workers=thread_count if use_multithread else 1,
+                max_workers=cfg.thread_count,
                 ollama_base_url=ollama_url,
                 ollama_text_model=ollama_text_model,
                 ollama_vision_model=ollama_vision_model,
-                batch_size=batch_size,
-                resume=resume,
-                file_lock_callback=on_file_locked
+                batch_size=cfg.batch_size,
+                resume=cfg.resume,
+                file_lock_callback=on_file_locked,
+                result_callback=on_result
             )
             
-            results = result.get("results", [])
             stats = result.get("stats", {})
             classify_result = result.get("classify_result")
             report_result = result.get("report_result")
@@ -553,16 +678,6 @@ class InvoiceGUI:
             self._log(f"处理完成: 成功 {stats.get('success', 0)}/{stats.get('total_files', 0)}")
             self._log(f"耗时: {stats.get('total_time', 0):.2f} 秒")
             
-            # 显示各发票识别结果
-            for r in results:
-                if r.get("success"):
-                    info = r.get("info", {})
-                    filename = Path(r['file_path']).name
-                    seller = info.get('销售方名称') or '未识别'
-                    invoice_no = info.get('发票号码') or '未识别'
-                    self._log(f"✓ {filename}")
-                    self._log(f"  → 发票号: {invoice_no}, 销方: {seller[:20]}")
-            
             # 显示分类结果
             if classify_result:
                 self._log("-" * 50)
@@ -605,14 +720,39 @@ class InvoiceGUI:
         self.processing = False
         self._log("用户请求停止处理...")
     
+    # 日志批量刷新周期（毫秒）与单次最多取出的条数
+    LOG_DRAIN_INTERVAL_MS = 100
+    LOG_DRAIN_MAX_LINES = 1000
+    # 日志缓冲上限：超过后从顶部整段裁剪，Text组件的渲染开销
+    # 随总行数线性增长，长时间运行不裁剪会越来越卡
+    LOG_MAX_LINES = 5000
+    LOG_TRIM_LINES = 1000
+
     def _log(self, message: str):
-        """添加日志"""
-        def _append():
+        """添加日志（线程安全，仅入队）"""
+        self._log_queue.put(message + "\n")
+
+    def _drain_log(self):
+        """主循环定时批量取出日志并一次性插入文本框"""
+        lines = []
+        try:
+            while len(lines) < self.LOG_DRAIN_MAX_LINES:
+                lines.append(self._log_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if lines:
             self.log_text.config(state=tk.NORMAL)
-            self.log_text.insert(tk.END, message + "\n")
+            self.log_text.insert(tk.END, "".join(lines))
+            # 缓冲超限时从顶部一次性裁剪一段，保持插入成本恒定
+            if self.limit_log_buffer.get():
+                line_count = int(self.log_text.index('end-1c').split('.')[0])
+                if line_count > self.LOG_MAX_LINES:
+                    self.log_text.delete('1.0', f'{self.LOG_TRIM_LINES}.0')
             self.log_text.see(tk.END)
             self.log_text.config(state=tk.DISABLED)
-        self.root.after(0, _append)
+
+        self.root.after(self.LOG_DRAIN_INTERVAL_MS, self._drain_log)
     
     def _clear_log(self):
         """清空日志"""
@@ -624,6 +764,7 @@ class InvoiceGUI:
         """运行GUI"""
         self._log("发票管理系统 V2 已启动")
         self._log("请选择发票文件夹并配置LLM选项")
+        self.root.after(self.LOG_DRAIN_INTERVAL_MS, self._drain_log)
         self.root.mainloop()
 
 
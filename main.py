@@ -91,13 +91,13 @@ def check_llm_availability():
     """检查LLM可用性"""
     print("检查LLM可用性...\n")
     
-    from core.llm import LLMFactory
+    from core.llm import get_llm
     
     providers = ["gemini", "deepseek", "openai", "ollama"]
     
     for provider in providers:
         try:
-            adapter = LLMFactory.create(provider)
+            adapter = get_llm(provider)
             available = adapter.is_available()
             status = "✓ 可用" if available else "✗ 不可用"
             print(f"  {provider.upper():10} {status} ({adapter.model_name})")
@@ -6,14 +6,73 @@
 """
 
 import os
+import re
 import logging
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
-from core.config.settings import EXTRACTION_MODE, OUTPUT_DIR
+from core.config.settings import EXTRACTION_MODE, LLM_PROVIDER, OUTPUT_DIR
 from core.extractors import get_extractor, InvoiceInfo
 from core.llm import get_llm
 
+# 发票关键词预过滤的单遍多模式匹配：可选pyahocorasick把8个关键词
+# 编成一个DFA一遍扫完；未安装时退回长词优先的合并正则交替，同样单遍。
+# 命中词蕴含其子串关键词（如"发票号码"蕴含"发票"），计数语义与逐词in一致
+try:
+    import ahocorasick as _ahocorasick
+except ImportError:
+    _ahocorasick = None
+
+# pypdfium2（PDFium的Python绑定）解析文本比pdfplumber快一个数量级；
+# 未安装时全部走pdfplumber路径
+try:
+    import pypdfium2 as _pdfium
+except ImportError:
+    _pdfium = None
+
+_INVOICE_KEYWORDS = frozenset(
+    {'发票', '税号', '纳税人识别号', '价税合计', '税额', '开票日期', '发票代码', '发票号码'}
+)
+
+if _ahocorasick is not None:
+    _KEYWORD_AUTOMATON = _ahocorasick.Automaton()
+    for _kw in _INVOICE_KEYWORDS:
+        _KEYWORD_AUTOMATON.add_word(_kw, _kw)
+    _KEYWORD_AUTOMATON.make_automaton()
+    del _kw
+else:
+    _KEYWORD_AUTOMATON = None
+
+_KEYWORD_PATTERN = re.compile(
+    "|".join(sorted(_INVOICE_KEYWORDS, key=len, reverse=True))
+)
+_KEYWORD_IMPLIES = {
+    kw: frozenset(k for k in _INVOICE_KEYWORDS if k in kw) for kw in _INVOICE_KEYWORDS
+}
+
+# 关键词的UTF-8字节串：str关键词在文本中出现，其字节序列必然在原始
+# 字节中出现，所以字节级"一个都没有"即可确定拒绝，无需解码/解析
+_KW_BYTES = tuple(kw.encode("utf-8") for kw in _INVOICE_KEYWORDS)
+
+
+def _bytes_likely_invoice(buf: bytes) -> bool:
+    """字节级关键词预检，与_is_likely_invoice同阈值（2个不同关键词）"""
+    count = 0
+    for kw in _KW_BYTES:
+        if kw in buf:
+            count += 1
+            if count >= 2:
+                return True
+    return False
+
+def _ext_lower(path: str) -> str:
+    """取小写扩展名（含点）；纯字符串操作，免去热循环里的Path对象构造"""
+    dot = path.rfind('.')
+    if dot < 0 or '/' in path[dot:] or '\\' in path[dot:]:
+        return ''
+    return path[dot:].lower()
+
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -22,10 +81,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# 进程级处理器缓存：适配器构建可能建立HTTP会话、探测模型可用性，
+# 同一配置在一个进程生命周期内只构建一次（GUI多次运行、多文件夹场景）
+_PROCESSOR_CACHE: Dict[tuple, "InvoiceProcessor"] = {}
+
+
 class InvoiceProcessor:
     """发票处理器 V2"""
-    
-    SUPPORTED_EXTENSIONS = {'.pdf', '.ofd', '.jpg', '.jpeg', '.png', '.bmp', '.xml'}
+
+    SUPPORTED_EXTENSIONS = frozenset({'.pdf', '.ofd', '.jpg', '.jpeg', '.png', '.bmp', '.xml'})
     
     def __init__(
         self, 
@@ -34,11 +98,12 @@ class InvoiceProcessor:
         llm_model: str = None,
         ollama_base_url: str = None,
         ollama_text_model: str = None,
-        ollama_vision_model: str = None
+        ollama_vision_model: str = None,
+        text_cache_dir: str = None
     ):
         """
         初始化发票处理器
-        
+
         Args:
             extraction_mode: 提取模式 (llm/hybrid/vision/regex_fallback)
             llm_provider: LLM提供商 (gemini/openai/ollama)
@@ -46,8 +111,15 @@ class InvoiceProcessor:
             ollama_base_url: Ollama服务器地址 (可选)
             ollama_text_model: Ollama文本模型 (可选，用于PDF/OFD/XML)
             ollama_vision_model: Ollama图片模型 (可选，用于图片文件)
+            text_cache_dir: PDF文本磁盘缓存目录 (可选，为空时不缓存)
         """
         self.extraction_mode = extraction_mode or EXTRACTION_MODE
+
+        # PDF文本磁盘缓存：重跑时按(内容哈希, mtime)直接命中已提取文本，
+        # 整个PDF解析阶段被跳过
+        self.text_cache_dir = text_cache_dir
+        if text_cache_dir:
+            os.makedirs(text_cache_dir, exist_ok=True)
         
         # 初始化LLM适配器
         try:
@@ -90,7 +162,37 @@ class InvoiceProcessor:
     
     # 预过滤配置
     MAX_FILE_SIZE_MB = 5  # 最大文件大小（MB）
-    INVOICE_KEYWORDS = {'发票', '税号', '纳税人识别号', '价税合计', '税额', '开票日期', '发票代码', '发票号码'}
+    INVOICE_KEYWORDS = _INVOICE_KEYWORDS
+
+    @classmethod
+    def get_or_create(
+        cls,
+        extraction_mode: str = None,
+        llm_provider: str = None,
+        llm_model: str = None,
+        ollama_base_url: str = None,
+        ollama_text_model: str = None,
+        ollama_vision_model: str = None,
+        text_cache_dir: str = None
+    ) -> "InvoiceProcessor":
+        """
+        按配置复用处理器实例
+
+        参数同__init__；相同配置组合返回同一实例，避免重复构建
+        适配器/提取器（HTTP会话、模型探测等启动开销只付一次）。
+        """
+        key = (
+            extraction_mode, llm_provider, llm_model, ollama_base_url,
+            ollama_text_model, ollama_vision_model, text_cache_dir,
+        )
+        instance = _PROCESSOR_CACHE.get(key)
+        if instance is None:
+            instance = cls(
+                extraction_mode, llm_provider, llm_model, ollama_base_url,
+                ollama_text_model, ollama_vision_model, text_cache_dir,
+            )
+            _PROCESSOR_CACHE[key] = instance
+        return instance
     
     def process_file(self, file_path: str) -> Dict[str, Any]:
         """
@@ -102,52 +204,127 @@ class InvoiceProcessor:
         Returns:
             处理结果字典
         """
-        file_path = Path(file_path)
-        
-        if not file_path.exists():
-            return {"success": False, "error": f"文件不存在: {file_path}"}
-        
-        ext = file_path.suffix.lower()
-        if ext not in self.SUPPORTED_EXTENSIONS:
-            return {"success": False, "error": f"不支持的文件格式: {ext}"}
-        
-        # 预过滤1: 文件大小检查
-        file_size_mb = file_path.stat().st_size / (1024 * 1024)
-        if file_size_mb > self.MAX_FILE_SIZE_MB:
-            logger.info(f"跳过大文件 ({file_size_mb:.1f}MB > {self.MAX_FILE_SIZE_MB}MB): {file_path.name}")
-            return {"success": False, "error": f"文件过大 ({file_size_mb:.1f}MB)，跳过处理", "skipped": True}
-        
+        file_path = os.fspath(file_path)
+
+        pre_check_error = self._pre_check(file_path)
+        if pre_check_error is not None:
+            return pre_check_error
+
         logger.info(f"处理文件: {file_path}")
-        
+
         try:
             # 根据文件类型选择处理方式
-            if ext in {'.jpg', '.jpeg', '.png', '.bmp'}:
+            if _ext_lower(file_path) in {'.jpg', '.jpeg', '.png', '.bmp'}:
                 # 图片发票：直接使用视觉识别
-                info = self.extractor.extract_from_image(str(file_path))
+                info = self.extractor.extract_from_image(file_path)
             else:
                 # PDF/OFD/XML：先提取文本
-                text = self._extract_text(str(file_path))
+                text = self._extract_text(file_path)
                 if not text:
-                    return {"success": False, "error": "无法提取文本内容"}
-                
+                    return {"success": False, "file_path": file_path, "error": "无法提取文本内容"}
+
                 # 预过滤2: 关键词检测（仅对文本类文件）
                 if not self._is_likely_invoice(text):
-                    logger.info(f"跳过非发票文件（未检测到发票关键词）: {file_path.name}")
-                    return {"success": False, "error": "未检测到发票关键词，跳过处理", "skipped": True}
-                
-                info = self.extractor.extract(text, str(file_path))
-            
-            return {
-                "success": True,
-                "file_path": str(file_path),
-                "info": info.to_dict(),
-                "confidence": info.置信度,
-                "extraction_mode": info.提取方式,
-            }
-            
+                    logger.info(f"跳过非发票文件（未检测到发票关键词）: {os.path.basename(file_path)}")
+                    return {"success": False, "file_path": file_path, "error": "未检测到发票关键词，跳过处理", "skipped": True}
+
+                info = self.extractor.extract(text, file_path)
+
+            return self._success_result(file_path, info)
+
         except Exception as e:
             logger.error(f"处理文件失败: {file_path}, 错误: {e}")
-            return {"success": False, "error": str(e)}
+            return {"success": False, "file_path": file_path, "error": str(e)}
+
+    def _pre_check(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """公共预检：存在性、扩展名、文件大小；通过时返回None
+
+        失败结果一律带file_path：内容去重的扇出按该键查首份结果，
+        缺键会让重复文件拿不到结果、也进不了进度记录。
+        """
+        ext = _ext_lower(file_path)
+        if ext not in self.SUPPORTED_EXTENSIONS:
+            return {"success": False, "file_path": file_path, "error": f"不支持的文件格式: {ext}"}
+
+        try:
+            file_size = os.stat(file_path).st_size
+        except OSError:
+            return {"success": False, "file_path": file_path, "error": f"文件不存在: {file_path}"}
+
+        # 预过滤1: 文件大小检查
+        file_size_mb = file_size / (1024 * 1024)
+        if file_size_mb > self.MAX_FILE_SIZE_MB:
+            logger.info(f"跳过大文件 ({file_size_mb:.1f}MB > {self.MAX_FILE_SIZE_MB}MB): {os.path.basename(file_path)}")
+            return {"success": False, "file_path": file_path, "error": f"文件过大 ({file_size_mb:.1f}MB)，跳过处理", "skipped": True}
+
+        return None
+
+    @staticmethod
+    def _success_result(file_path: str, info) -> Dict[str, Any]:
+        """构造成功结果字典"""
+        return {
+            "success": True,
+            "file_path": file_path,
+            "info": info.to_dict(),
+            "confidence": info.置信度,
+            "extraction_mode": info.提取方式,
+        }
+
+    def process_file_batch(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量处理一组发票文件
+
+        文本类文件（PDF/OFD/XML）合并为一次批量LLM提取：多张发票
+        共享同一提示词前缀，prefill成本只付一次；图片等不适用批量
+        路径的文件逐个回退到 process_file。
+
+        Args:
+            file_paths: 文件路径列表
+
+        Returns:
+            与输入顺序对应的处理结果列表
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        batch_indexes = []
+        batch_texts = []
+
+        supports_batch = hasattr(self.extractor, "extract_batch")
+
+        for i, file_path in enumerate(file_paths):
+            pre_check_error = self._pre_check(file_path)
+            if pre_check_error is not None:
+                results[i] = pre_check_error
+                continue
+
+            if _ext_lower(file_path) in {'.jpg', '.jpeg', '.png', '.bmp'} or not supports_batch:
+                results[i] = self.process_file(file_path)
+                continue
+
+            text = self._extract_text(file_path)
+            if not text:
+                results[i] = {"success": False, "file_path": file_path, "error": "无法提取文本内容"}
+                continue
+            if not self._is_likely_invoice(text):
+                logger.info(f"跳过非发票文件（未检测到发票关键词）: {os.path.basename(file_path)}")
+                results[i] = {"success": False, "file_path": file_path, "error": "未检测到发票关键词，跳过处理", "skipped": True}
+                continue
+
+            batch_indexes.append(i)
+            batch_texts.append(text)
+
+        if batch_texts:
+            logger.info(f"批量提取 {len(batch_texts)} 张文本发票")
+            try:
+                infos = self.extractor.extract_batch(batch_texts)
+                for i, info in zip(batch_indexes, infos):
+                    results[i] = self._success_result(file_paths[i], info)
+            except Exception as e:
+                # 批量提取失败时逐个回退，单张失败不拖垮整批
+                logger.warning(f"批量提取失败，回退单张处理: {e}")
+                for i in batch_indexes:
+                    results[i] = self.process_file(file_paths[i])
+
+        return results
     
     def _is_likely_invoice(self, text: str) -> bool:
         """
@@ -162,9 +339,20 @@ class InvoiceProcessor:
         if not text:
             return False
         
-        # 检查是否包含至少2个发票关键词
-        found_keywords = sum(1 for keyword in self.INVOICE_KEYWORDS if keyword in text)
-        return found_keywords >= 2
+        # 单遍扫描，命中2个不同关键词即提前返回（无需读完全文）
+        found = set()
+        if _KEYWORD_AUTOMATON is not None:
+            for _, keyword in _KEYWORD_AUTOMATON.iter(text):
+                found.add(keyword)
+                if len(found) >= 2:
+                    return True
+            return False
+        
+        for match in _KEYWORD_PATTERN.finditer(text):
+            found |= _KEYWORD_IMPLIES[match.group()]
+            if len(found) >= 2:
+                return True
+        return False
     
     def process_folder(self, folder_path: str) -> List[Dict[str, Any]]:
         """
@@ -197,28 +385,111 @@ class InvoiceProcessor:
         
         return results
     
+    def _iter_collect_files(self, folder: Path):
+        """
+        递归扫描并边走边产出支持的文件路径（str）
+
+        生成器形式供流水线消费：消费方不必等整棵目录树走完就能开始
+        处理。目录内条目排序后产出，遍历顺序稳定。
+
+        Yields:
+            文件路径字符串
+        """
+        supported = self.SUPPORTED_EXTENSIONS
+
+        # 显式栈 + os.scandir遍历：DirEntry携带getdents已返回的类型信息，
+        # is_dir不触发额外stat；扩展名在字符串层判断，不为每个条目
+        # 构造Path对象
+        stack = [str(folder)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in sorted(it, key=lambda e: e.name):
+                        if entry.is_dir(follow_symlinks=False):
+                            # 跳过"已处理"文件夹，避免重复处理
+                            if entry.name != "已处理":
+                                stack.append(entry.path)
+                            continue
+                        if _ext_lower(entry.name) in supported:
+                            logger.debug(f"找到文件: {entry.path}")
+                            yield entry.path
+            except OSError as e:
+                logger.error(f"读取文件夹失败: {e}")
+
     def _collect_files(self, folder: Path) -> List[Path]:
         """递归收集文件夹及子文件夹中的发票文件"""
-        files = []
-        
-        # 使用os.walk递归遍历所有子文件夹
-        try:
-            for root, dirs, filenames in os.walk(folder):
-                # 跳过"已处理"文件夹，避免重复处理
-                dirs[:] = [d for d in dirs if d != "已处理"]
-                
-                for filename in filenames:
-                    ext = os.path.splitext(filename)[1].lower()
-                    if ext in self.SUPPORTED_EXTENSIONS:
-                        full_path = Path(root) / filename
-                        files.append(full_path)
-                        # 显示相对路径
-                        rel_path = full_path.relative_to(folder) if full_path.is_relative_to(folder) else full_path
-                        logger.info(f"找到文件: {rel_path}")
-        except Exception as e:
-            logger.error(f"读取文件夹失败: {e}")
-        
+        files = sorted(self._iter_collect_files(folder))
         logger.info(f"共找到 {len(files)} 个支持的文件（包含子文件夹）")
+        return [Path(f) for f in files]
+
+    def collect_files_indexed(self, folder: Path, cache_path: str) -> List[Path]:
+        """
+        带磁盘索引的文件收集（用于断点续传）
+
+        把每个目录的清单连同目录mtime一起pickle到索引文件；
+        目录mtime未变化时直接复用上次的清单，免去整目录的
+        readdir+stat。万级文件的文件夹（尤其网络盘）上，
+        续传启动的扫描耗时从数十秒降到亚秒级。
+
+        Args:
+            folder: 待扫描的文件夹
+            cache_path: 索引文件路径
+
+        Returns:
+            排序后的文件路径列表
+        """
+        import pickle
+
+        try:
+            with open(cache_path, "rb") as f:
+                old_index = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            old_index = {}
+
+        new_index = {}
+        files: List[Path] = []
+        pending = [str(folder)]
+
+        while pending:
+            dir_path = pending.pop()
+            try:
+                dir_mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+
+            cached = old_index.get(dir_path)
+            if cached is not None and cached["mtime_ns"] == dir_mtime:
+                entry = cached
+            else:
+                # 目录有变化（或首次扫描），scandir重建该目录的清单
+                entry = {"mtime_ns": dir_mtime, "files": [], "dirs": []}
+                try:
+                    with os.scandir(dir_path) as it:
+                        for dir_entry in it:
+                            if dir_entry.is_dir(follow_symlinks=False):
+                                # 跳过"已处理"文件夹，避免重复处理
+                                if dir_entry.name != "已处理":
+                                    entry["dirs"].append(dir_entry.name)
+                            elif os.path.splitext(dir_entry.name)[1].lower() in self.SUPPORTED_EXTENSIONS:
+                                entry["files"].append(dir_entry.name)
+                except OSError as e:
+                    logger.error(f"读取文件夹失败: {dir_path}, {e}")
+                    continue
+
+            new_index[dir_path] = entry
+            files.extend(Path(dir_path) / name for name in entry["files"])
+            pending.extend(os.path.join(dir_path, name) for name in entry["dirs"])
+
+        # 原子写回索引，供下次续传复用
+        try:
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(new_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"写入扫描索引失败: {e}")
+
+        logger.info(f"共找到 {len(files)} 个支持的文件（索引扫描）")
         return sorted(files)
     
     def _extract_text(self, file_path: str) -> Optional[str]:
@@ -227,8 +498,8 @@ class InvoiceProcessor:
         
         支持PDF、OFD、XML格式
         """
-        ext = Path(file_path).suffix.lower()
-        
+        ext = _ext_lower(file_path)
+
         if ext == '.pdf':
             return self._extract_text_from_pdf(file_path)
         elif ext == '.ofd':
@@ -239,70 +510,265 @@ class InvoiceProcessor:
             return None
     
     def _extract_text_from_pdf(self, file_path: str) -> Optional[str]:
-        """从PDF提取文本"""
+        """从PDF提取文本（磁盘缓存命中时跳过解析）"""
+        try:
+            import mmap
+            # mmap映射后作为流传入：解析器跨页随机seek/read直接落在
+            # 映射页上（与去重哈希共享同一份页缓存），免去整份read拷贝；
+            # mmap对象本身即可seek/read，无需再包一层BytesIO
+            with open(file_path, "rb") as f:
+                try:
+                    stream = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    # 空文件或不支持mmap的文件系统，直接用文件对象
+                    stream = None
+                try:
+                    cache_path = self._text_cache_path(file_path, stream)
+                    if cache_path is not None:
+                        try:
+                            with open(cache_path, "r", encoding="utf-8") as cf:
+                                return cf.read()
+                        except OSError:
+                            pass
+
+                    text = self._parse_pdf(file_path, stream, f)
+
+                    if text and cache_path is not None:
+                        # 原子写入缓存条目，供下次运行直接命中
+                        try:
+                            tmp_path = cache_path + ".tmp"
+                            with open(tmp_path, "w", encoding="utf-8") as cf:
+                                cf.write(text)
+                            os.replace(tmp_path, cache_path)
+                        except OSError as e:
+                            logger.debug(f"写入文本缓存失败: {e}")
+                    return text
+                finally:
+                    if stream is not None:
+                        stream.close()
+        except Exception as e:
+            logger.error(f"PDF文本提取失败: {e}")
+            return None
+
+    def _text_cache_path(self, file_path: str, stream) -> Optional[str]:
+        """
+        计算PDF文本缓存条目路径；缓存未启用时返回None
+
+        缓存键为 内容SHA-256前16位 + mtime：内容或时间戳任一变化
+        即miss，旧条目留在目录里不影响正确性。每个键一个独立txt
+        文件，多进程worker并发读写天然安全。
+        """
+        if not self.text_cache_dir or stream is None:
+            return None
+        import hashlib
+        key = hashlib.sha256(stream).hexdigest()[:16]
+        mtime_ns = os.stat(file_path).st_mtime_ns
+        return os.path.join(self.text_cache_dir, f"{key}_{mtime_ns}.txt")
+
+    def _parse_pdf(self, file_path: str, stream, fp) -> Optional[str]:
+        """
+        解析PDF文本：优先pypdfium2快速路径，必要时回退pdfplumber
+
+        PDFium的C层文本提取比pdfplumber的纯Python布局分析快一个
+        数量级；提取结果过短（扫描件、字体编码异常）时仍交给
+        pdfplumber复核，保证提取质量不回退。
+        """
+        if _pdfium is not None:
+            try:
+                pdf = _pdfium.PdfDocument(stream if stream is not None else file_path)
+                try:
+                    texts = []
+                    for i in range(min(len(pdf), 5)):  # 最多处理5页
+                        textpage = pdf[i].get_textpage()
+                        texts.append(textpage.get_text_range())
+                        textpage.close()
+                    full = "\n".join(texts)
+                finally:
+                    pdf.close()
+                if len(full.strip()) >= 40:
+                    return full
+            except Exception as e:
+                logger.debug(f"pypdfium2解析失败，回退pdfplumber: {e}")
+            if stream is not None:
+                stream.seek(0)
+
         try:
             import pdfplumber
-            with pdfplumber.open(file_path) as pdf:
-                texts = []
-                for page in pdf.pages[:5]:  # 最多处理5页
-                    text = page.extract_text()
-                    if text:
-                        texts.append(text)
-                return "\n".join(texts)
         except ImportError:
             logger.error("需要安装pdfplumber: pip install pdfplumber")
             return None
-        except Exception as e:
-            logger.error(f"PDF文本提取失败: {e}")
-            return None
+
+        from core.pdf_fastpath import extract_page_text
+
+        with pdfplumber.open(stream if stream is not None else fp) as pdf:
+            texts = []
+            for page in pdf.pages[:5]:  # 最多处理5页
+                text = extract_page_text(page)
+                if text:
+                    texts.append(text)
+            return "\n".join(texts)
     
+    # OFD文本提取的累计预算：关键词检测和LLM提示所需文本远小于此，
+    # 超过即停止解析剩余条目
+    OFD_TEXT_BUDGET = 200 * 1024
+
     def _extract_text_from_ofd(self, file_path: str) -> Optional[str]:
         """从OFD提取文本"""
         try:
             import zipfile
-            import xml.etree.ElementTree as ET
-            
+
             with zipfile.ZipFile(file_path, 'r') as zf:
-                texts = []
-                for name in zf.namelist():
-                    if name.endswith('.xml'):
-                        content = zf.read(name).decode('utf-8', errors='ignore')
-                        # 简单提取XML中的文本内容
-                        try:
-                            root = ET.fromstring(content)
-                            for elem in root.iter():
-                                if elem.text and elem.text.strip():
-                                    texts.append(elem.text.strip())
-                        except ET.ParseError:
-                            pass
+                names = zf.namelist()
+                # 发票文本都在文档内容/页面XML里；签名、附件、元数据等
+                # 条目没有可用文本，按名称预筛后不再解压解析
+                content_names = [
+                    name for name in names
+                    if name.endswith('.xml')
+                    and name.startswith('Doc_')
+                    and ('Content' in name or 'Pages' in name)
+                ]
+                texts = self._parse_ofd_entries(zf, content_names)
+                if not texts:
+                    # 非常规目录布局，退回全量扫描
+                    texts = self._parse_ofd_entries(
+                        zf, [n for n in names if n.endswith('.xml')]
+                    )
                 return "\n".join(texts)
         except Exception as e:
             logger.error(f"OFD文本提取失败: {e}")
             return None
+
+    def _parse_ofd_entries(self, zf, names: List[str]) -> List[str]:
+        """
+        流式解析一组OFD内嵌XML，收集文本内容
+
+        iterparse直接吃解压流并逐元素产出，取完文本即clear释放，
+        峰值内存从整棵DOM降到单个元素；累计文本超出预算时提前结束。
+
+        Args:
+            zf: 打开的ZipFile对象
+            names: 要解析的条目名列表
+
+        Returns:
+            文本片段列表
+        """
+        import xml.etree.ElementTree as ET
+
+        texts: List[str] = []
+        total_len = 0
+        for name in names:
+            try:
+                with zf.open(name) as fp:
+                    for _, elem in ET.iterparse(fp, events=('end',)):
+                        text = elem.text
+                        if text and (text := text.strip()):
+                            texts.append(text)
+                            total_len += len(text)
+                        elem.clear()
+                        if total_len >= self.OFD_TEXT_BUDGET:
+                            return texts
+            except ET.ParseError:
+                pass
+        return texts
     
+    # XML字节级预检的窗口大小：窗口盖住整个文件时预检结果才可作拒绝依据
+    XML_PRESCAN_BYTES = 32 * 1024
+
     def _extract_text_from_xml(self, file_path: str) -> Optional[str]:
         """从XML提取文本"""
+        import xml.etree.ElementTree as ET
+
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            import xml.etree.ElementTree as ET
+            # 字节级预检：关键词的字节序列凑不够2个时，后续的关键词
+            # 检测必然拒绝该文件，直接返回解码文本，不做任何解析。
+            # 只读一个固定窗口；文件超出窗口时不据此下结论
+            with open(file_path, 'rb') as f:
+                prefix = f.read(self.XML_PRESCAN_BYTES + 1)
+            if len(prefix) <= self.XML_PRESCAN_BYTES and not _bytes_likely_invoice(prefix):
+                return prefix.decode('utf-8', errors='ignore')
+
+            # iterparse流式解析：逐元素取文本后clear释放，峰值内存与
+            # 文件大小无关（整读+fromstring在多MB的XML上峰值约3倍文件大小）
             texts = []
             try:
-                root = ET.fromstring(content)
-                for elem in root.iter():
-                    if elem.text and elem.text.strip():
-                        texts.append(elem.text.strip())
+                for _, elem in ET.iterparse(file_path, events=('end',)):
+                    text = elem.text
+                    if text and (text := text.strip()):
+                        texts.append(text)
+                    elem.clear()
             except ET.ParseError:
                 # 如果XML解析失败，返回原始内容
-                return content
-            
+                with open(file_path, 'rb') as f:
+                    return f.read().decode('utf-8', errors='ignore')
+
             return "\n".join(texts)
         except Exception as e:
             logger.error(f"XML文本提取失败: {e}")
             return None
 
 
+# 进程池worker的进程内处理器（initializer中构建一次，worker生命周期内复用）
+_WORKER_PROCESSOR: Optional[InvoiceProcessor] = None
+
+
+def _init_worker(config: Dict[str, Any]):
+    """进程池worker初始化：在子进程内构建处理器（适配器不可跨进程pickle）"""
+    global _WORKER_PROCESSOR
+    _WORKER_PROCESSOR = InvoiceProcessor.get_or_create(**config)
+
+
+def _process_file_worker(file_path: str) -> Dict[str, Any]:
+    """进程池worker入口：处理单个文件，返回可pickle的结果字典"""
+    try:
+        return _WORKER_PROCESSOR.process_file(file_path)
+    except Exception as e:
+        logger.error(f"处理失败 {file_path}: {e}")
+        return {"file_path": file_path, "success": False, "error": str(e)}
+
+
+def _advise_willneed(paths: List[str]):
+    """提示内核预读取整批文件（Linux的posix_fadvise WILLNEED）
+
+    一次性把所有文件排入内核预读队列后再开始消费，磁盘等待从
+    逐文件串行变为批量异步；不支持的平台上为空操作。
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for file_path in paths:
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+
+def _hash_file_content(file_path: str) -> Optional[str]:
+    """计算文件内容SHA-256（mmap整体映射后直接喂给摘要器）"""
+    import mmap
+    import hashlib
+
+    try:
+        with open(file_path, "rb", buffering=0) as f:
+            try:
+                # sha256在C层直接遍历映射页，零Python侧缓冲拷贝；
+                # 映射页随后被文本提取阶段复用，同一文件不读两遍
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return hashlib.sha256(mm).hexdigest()
+            except (ValueError, OSError):
+                # 空文件或不支持mmap的文件系统，回退到流式读取
+                digest = hashlib.sha256()
+                buf = bytearray(1 << 20)
+                view = memoryview(buf)
+                while n := f.readinto(buf):
+                    digest.update(view[:n])
+                return digest.hexdigest()
+    except OSError:
+        return None
+
+
 def process_invoices(
     source_folder: str,
     output_folder: str = None,
@@ -318,7 +784,8 @@ def process_invoices(
     batch_size: int = 10,
     resume: bool = False,
     progress_callback: callable = None,
-    file_lock_callback: callable = None
+    file_lock_callback: callable = None,
+    result_callback: callable = None
 ) -> Dict[str, Any]:
     """
     便捷函数：处理发票并生成报告
@@ -339,16 +806,20 @@ def process_invoices(
         resume: 是否继续上次未完成的进度（默认False）
         progress_callback: 进度回调函数 callback(current, total, message)
         file_lock_callback: 文件锁定回调函数 callback(message) -> bool，返回False取消等待
+        result_callback: 逐文件结果回调 callback(result_dict)；提供时结果
+            流式交给调用方，不再整体留存（大批量时返回值中results为空列表，
+            峰值内存不随文件数增长）
         
     Returns:
         处理结果汇总
     """
     from datetime import datetime
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
     from report_generator import (
-        generate_excel_report, 
+        generate_excel_report,
         classify_and_copy_files,
-        generate_stats_report
+        generate_stats_report,
+        _ExcelWriter
     )
     from core.progress_manager import ProgressManager
     
@@ -361,119 +832,294 @@ def process_invoices(
     # 初始化进度管理器
     progress_mgr = ProgressManager(output_folder)
     
-    # 创建处理器（传递双模型参数）
-    processor = InvoiceProcessor(
-        extraction_mode, 
-        llm_provider, 
-        llm_model, 
+    # 创建处理器（传递双模型参数；同配置复用进程内已有实例）
+    text_cache_dir = os.path.join(output_folder, ".text_cache")
+    processor = InvoiceProcessor.get_or_create(
+        extraction_mode,
+        llm_provider,
+        llm_model,
         ollama_base_url,
         ollama_text_model,
-        ollama_vision_model
+        ollama_vision_model,
+        text_cache_dir=text_cache_dir
     )
     
-    # 收集所有文件
     folder = Path(source_folder)
-    all_files = processor._collect_files(folder)
-    all_files_str = [str(f) for f in all_files]
+
+    # 解析路径（pdfplumber/ElementTree）是持有GIL的CPU密集代码，多worker时
+    # 用进程池获得跨核真并行；云端API场景的瓶颈是网络等待，线程池足够
+    # 且省去子进程启动和任务序列化开销
+    use_process_pool = max_workers > 1 and (
+        processor.extraction_mode == "regex_fallback"
+        or (llm_provider or LLM_PROVIDER) not in ("gemini", "openai", "deepseek")
+    )
+    worker_config = {
+        "extraction_mode": extraction_mode,
+        "llm_provider": llm_provider,
+        "llm_model": llm_model,
+        "ollama_base_url": ollama_base_url,
+        "ollama_text_model": ollama_text_model,
+        "ollama_vision_model": ollama_vision_model,
+        "text_cache_dir": text_cache_dir,
+    }
+    process_pool = None
+
+    def ensure_process_pool():
+        """惰性创建进程池并跨批次复用（worker内的适配器只初始化一次）"""
+        nonlocal process_pool
+        if process_pool is None:
+            process_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(worker_config,),
+            )
+        return process_pool
     
-    # 处理断点续传
-    if resume and progress_mgr.has_existing_progress():
-        progress_mgr.load_progress()
-        files_to_process = progress_mgr.get_pending_files(all_files_str)
-        logger.info(f"继续上次进度: 已处理 {progress_mgr.processed_count}, 待处理 {len(files_to_process)}")
+    # 文件来源。续传模式：磁盘索引整批收集后与已处理集合求差；
+    # 全新运行：扫描线程边遍历边入队（有界队列限流），目录扫描与
+    # PDF解析/LLM等待流水线重叠，万级文件的文件夹不再是"先干等
+    # 几十秒扫描再开工"
+    import threading
+    import queue
+
+    progress_settings = {
+        "extraction_mode": extraction_mode,
+        "llm_provider": llm_provider,
+        "batch_size": batch_size
+    }
+    discovered_box = [0]  # 扫描线程递增；进度回调将其作为当前已知总数
+    pending_total = None  # 已知的待处理总数（流水线扫描时未知）
+
+    if resume:
+        scan_index_path = os.path.join(output_folder, ".scan_index.pkl")
+        all_files_str = [
+            str(f) for f in processor.collect_files_indexed(folder, scan_index_path)
+        ]
+        if progress_mgr.has_existing_progress():
+            progress_mgr.load_progress()
+            files_to_process = progress_mgr.get_pending_files(all_files_str)
+            logger.info(f"继续上次进度: 已处理 {progress_mgr.processed_count}, 待处理 {len(files_to_process)}")
+        else:
+            files_to_process = all_files_str
+            progress_mgr.init_new_progress(
+                source_folder=source_folder,
+                total_files=len(files_to_process),
+                settings=progress_settings
+            )
+
+        if not files_to_process:
+            logger.info("没有待处理的文件")
+            progress_mgr.mark_completed()
+            return {
+                "results": [],
+                "stats": generate_stats_report(start_time, datetime.now(), 0, 0),
+                "classify_result": None,
+                "report_result": None,
+                "output_folder": output_folder
+            }
+
+        pending_total = len(files_to_process)
+        discovered_box[0] = pending_total
+
+        def iter_pending_files():
+            yield from files_to_process
     else:
-        # 初始化新进度
-        files_to_process = all_files_str
+        # 总数在扫描完成后回填
         progress_mgr.init_new_progress(
             source_folder=source_folder,
-            total_files=len(files_to_process),
-            settings={
-                "extraction_mode": extraction_mode,
-                "llm_provider": llm_provider,
-                "batch_size": batch_size
-            }
+            total_files=0,
+            settings=progress_settings
         )
-    
-    if not files_to_process:
-        logger.info("没有待处理的文件")
-        progress_mgr.mark_completed()
-        return {
-            "results": [],
-            "stats": generate_stats_report(start_time, datetime.now(), 0, 0),
-            "classify_result": None,
-            "report_result": None,
-            "output_folder": output_folder
-        }
-    
-    # 所有结果（用于最终统计）
+        file_queue = queue.Queue(maxsize=batch_size * 4)
+
+        def _produce_files():
+            try:
+                for discovered_path in processor._iter_collect_files(folder):
+                    discovered_box[0] += 1
+                    file_queue.put(discovered_path)
+            finally:
+                file_queue.put(None)  # 结束哨兵
+
+        threading.Thread(target=_produce_files, name="file-scan", daemon=True).start()
+
+        def iter_pending_files():
+            while True:
+                item = file_queue.get()
+                if item is None:
+                    return
+                yield item
+
+    def iter_batches():
+        """把文件流攒成batch_size大小的批"""
+        batch = []
+        for pending_path in iter_pending_files():
+            batch.append(pending_path)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # 内容去重状态（跨批增量维护）：邮件转发常使同一张发票以不同
+    # 文件名出现多次，内容相同的只过一次提取，结果扇出到重复路径。
+    # 首份结果按路径留存供后续批次的重复文件复用，O(唯一文件数)
+    digest_to_canonical: Dict[str, str] = {}
+    canonical_results: Dict[str, Dict[str, Any]] = {}
+    duplicate_total = 0
+
+    # 所有结果（流式回调模式下不留存逐文件结果，只做计数统计）
     all_results = []
-    total_files = len(files_to_process)
+    success_total = 0
     excel_path = os.path.join(output_folder, "发票汇总报告.xlsx")
+
+    # 常驻Excel写入器：工作簿整个运行只打开/解析一次，每批flush仅追加新行
+    excel_writer = _ExcelWriter(excel_path, file_lock_callback) if generate_report else None
     
     # 批量处理文件
     def process_batch(batch_files: List[str]) -> List[Dict[str, Any]]:
         """处理一批文件"""
         batch_results = []
-        
+        completions = []  # (文件路径, 是否成功)，批次结束后一次性写入进度
+
+        if max_workers > 1 and len(batch_files) > 1 and use_process_pool:
+            # 进程池处理批次：每个子进程持有自己的处理器/适配器，绕开GIL
+            # 跨核并行解析；chunksize按约4*workers分摊任务提交开销
+            chunk_size = max(1, len(batch_files) // (max_workers * 4))
+            try:
+                batch_results = list(ensure_process_pool().map(
+                    _process_file_worker, batch_files, chunksize=chunk_size
+                ))
+                progress_mgr.add_processed_batch(
+                    [(f, r.get("success", False)) for f, r in zip(batch_files, batch_results)]
+                )
+                return batch_results
+            except Exception as e:
+                logger.warning(f"进程池批处理失败，回退线程池: {e}")
+
         if max_workers > 1 and len(batch_files) > 1:
-            # 多线程处理批次
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_file = {
-                    executor.submit(processor.process_file, f): f 
-                    for f in batch_files
-                }
-                for future in as_completed(future_to_file):
-                    file_path = future_to_file[future]
+            # 多线程处理批次：按块提交而非逐文件提交，每个任务在本地
+            # 迭代一段文件，future数量从N降到约4*workers，减少任务队列
+            # 的锁竞争和上下文切换；结果顺序由executor.map保证
+            chunk_size = max(1, len(batch_files) // (max_workers * 4))
+            chunks = [
+                batch_files[i:i + chunk_size]
+                for i in range(0, len(batch_files), chunk_size)
+            ]
+
+            def process_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+                chunk_results = []
+                for file_path in chunk:
                     try:
-                        result = future.result()
-                        batch_results.append(result)
-                        # 记录进度
-                        progress_mgr.add_processed(file_path, result.get("success", False))
+                        result = processor.process_file(file_path)
                     except Exception as e:
                         logger.error(f"处理失败 {file_path}: {e}")
-                        batch_results.append({"file_path": file_path, "success": False, "error": str(e)})
-                        progress_mgr.add_processed(file_path, False)
+                        result = {"file_path": file_path, "success": False, "error": str(e)}
+                    chunk_results.append(result)
+                return chunk_results
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for chunk, chunk_results in zip(chunks, executor.map(process_chunk, chunks)):
+                    batch_results.extend(chunk_results)
+                    completions.extend(
+                        (f, r.get("success", False))
+                        for f, r in zip(chunk, chunk_results)
+                    )
         else:
-            # 单线程处理
-            for file_path in batch_files:
-                try:
-                    result = processor.process_file(file_path)
-                    batch_results.append(result)
-                    progress_mgr.add_processed(file_path, result.get("success", False))
-                except Exception as e:
-                    logger.error(f"处理失败 {file_path}: {e}")
-                    batch_results.append({"file_path": file_path, "success": False, "error": str(e)})
-                    progress_mgr.add_processed(file_path, False)
+            # 单线程：文本类文件合并为一次批量LLM提取（共享提示词前缀）
+            try:
+                batch_results = processor.process_file_batch(batch_files)
+            except Exception as e:
+                logger.error(f"批次处理失败: {e}")
+                batch_results = [
+                    {"file_path": f, "success": False, "error": str(e)}
+                    for f in batch_files
+                ]
+            completions = [
+                (f, r.get("success", False))
+                for f, r in zip(batch_files, batch_results)
+            ]
+        
+        # 批次完成后一次性记录进度（合并写系统调用）
+        progress_mgr.add_processed_batch(completions)
         
         return batch_results
     
-    # 分批处理
+    # 分批处理（内容哈希是I/O为主的工作，小线程池跨批复用）
     processed_count = 0
+    batch_num = 0
     batch_classify_total = {"success": 0, "failed": 0, "folders_created": 0}
-    
-    for batch_start in range(0, total_files, batch_size):
-        batch_end = min(batch_start + batch_size, total_files)
-        batch_files = files_to_process[batch_start:batch_end]
-        batch_num = batch_start // batch_size + 1
-        total_batches = (total_files + batch_size - 1) // batch_size
-        
-        logger.info(f"处理批次 {batch_num}/{total_batches} ({len(batch_files)} 文件)")
-        
+    hash_pool = ThreadPoolExecutor(max_workers=4)
+
+    for raw_batch in iter_batches():
+        batch_num += 1
+        if pending_total is not None:
+            total_batches = (pending_total + batch_size - 1) // batch_size
+            batch_label = f"{batch_num}/{total_batches}"
+        else:
+            batch_label = f"{batch_num}"
+
+        logger.info(f"处理批次 {batch_label} ({len(raw_batch)} 文件)")
+
+        # 冷缓存下哈希是本批第一轮全量读取，先整批下发预读提示
+        _advise_willneed(raw_batch)
+        digests = list(hash_pool.map(_hash_file_content, raw_batch))
+        batch_files = []
+        dup_entries = []  # (重复路径, 首份路径)
+        for file_path, digest in zip(raw_batch, digests):
+            canonical = digest_to_canonical.get(digest) if digest else None
+            if canonical is None:
+                if digest:
+                    digest_to_canonical[digest] = file_path
+                batch_files.append(file_path)
+            else:
+                dup_entries.append((file_path, canonical))
+        if dup_entries:
+            duplicate_total += len(dup_entries)
+            logger.info(f"本批检测到 {len(dup_entries)} 个内容重复的文件，复用首份的识别结果")
+
         # 处理当前批次
-        batch_results = process_batch(batch_files)
-        all_results.extend(batch_results)
+        batch_results = process_batch(batch_files) if batch_files else []
+
+        for r in batch_results:
+            canonical_results[r.get("file_path")] = r
+
+        # 把结果扇出到内容相同的重复文件路径
+        if dup_entries:
+            fanned_out = []
+            for dup_path, canonical_path in dup_entries:
+                base = canonical_results.get(canonical_path)
+                if base is None:
+                    continue
+                dup = dict(base)
+                dup["file_path"] = dup_path
+                fanned_out.append(dup)
+            if fanned_out:
+                batch_results.extend(fanned_out)
+                progress_mgr.add_processed_batch(
+                    [(r["file_path"], r.get("success", False)) for r in fanned_out]
+                )
+        if result_callback is not None:
+            # 流式交给调用方，处理完即释放，不在本函数内累积
+            for r in batch_results:
+                try:
+                    result_callback(r)
+                except Exception:
+                    pass
+        else:
+            all_results.extend(batch_results)
         
         # 统计本批次成功数
         batch_success = sum(1 for r in batch_results if r.get("success"))
+        success_total += batch_success
         processed_count += len(batch_results)
         
-        # 进度回调
+        # 进度回调（流水线扫描时总数为"目前已发现"的数量，随扫描增长）
         if progress_callback:
             try:
                 progress_callback(
-                    processed_count, 
-                    total_files, 
-                    f"批次 {batch_num}/{total_batches} 完成"
+                    processed_count,
+                    max(discovered_box[0], processed_count),
+                    f"批次 {batch_label} 完成"
                 )
             except Exception:
                 pass
@@ -486,32 +1132,61 @@ def process_invoices(
                 batch_classify_total["success"] += classify_result.get("success", 0)
                 batch_classify_total["failed"] += classify_result.get("failed", 0)
                 batch_classify_total["folders_created"] += classify_result.get("folders_created", 0)
-                logger.info(f"批次 {batch_num}: 复制 {classify_result['success']} 个文件")
+                logger.info(f"批次 {batch_label}: 复制 {classify_result['success']} 个文件")
             
             # 追加写入Excel
             if generate_report:
                 report_result = generate_excel_report(
-                    batch_results, 
-                    excel_path, 
+                    batch_results,
+                    excel_path,
                     append=True,
-                    file_lock_callback=file_lock_callback
+                    file_lock_callback=file_lock_callback,
+                    excel_writer=excel_writer
                 )
                 if report_result['success']:
-                    logger.info(f"批次 {batch_num}: 写入Excel {report_result['record_count']} 条")
+                    logger.info(f"批次 {batch_label}: 写入Excel {report_result['record_count']} 条")
                 else:
-                    logger.warning(f"批次 {batch_num}: Excel写入失败 - {report_result.get('error')}")
-        
-        logger.info(f"进度: {processed_count}/{total_files} ({processed_count/total_files*100:.1f}%)")
-    
+                    logger.warning(f"批次 {batch_label}: Excel写入失败 - {report_result.get('error')}")
+
+        logger.info(f"进度: {processed_count}/{max(discovered_box[0], processed_count)}")
+
+    hash_pool.shutdown()
+    if duplicate_total:
+        logger.info(f"共 {duplicate_total} 个内容重复的文件复用了首份识别结果")
+
+    # 流水线扫描模式下初始化时总数未知，扫描结束后回填
+    if pending_total is None:
+        progress_mgr.set_total_files(processed_count)
+
+    if process_pool is not None:
+        process_pool.shutdown()
+
+    if excel_writer is not None:
+        try:
+            excel_writer.close()
+        except Exception as e:
+            logger.warning(f"关闭Excel写入器失败: {e}")
+
     # 处理完成，标记进度
     progress_mgr.mark_completed()
     
-    # 统计
-    success_count = sum(1 for r in all_results if r.get("success"))
-    failed_count = len(all_results) - success_count
+    # 统计（计数器在两种模式下都有效）
+    success_count = success_total
+    failed_count = processed_count - success_total
     
     end_time = datetime.now()
     stats = generate_stats_report(start_time, end_time, success_count, failed_count)
+
+    # LLM响应缓存命中统计：缓存按 模型+完整提示词 哈希，同一发票文本
+    # 重跑时字节级命中，整次LLM往返被跳过
+    from core.llm.cache import get_llm_cache
+    llm_cache = get_llm_cache()
+    if llm_cache is not None and (llm_cache.hits or llm_cache.misses):
+        stats["llm_cache_hits"] = llm_cache.hits
+        stats["llm_cache_misses"] = llm_cache.misses
+        logger.info(
+            f"LLM缓存: 命中 {llm_cache.hits} / 未命中 {llm_cache.misses}"
+        )
     
     # 最终报告结果
     final_report_result = None
@@ -5,37 +5,109 @@
 测试LLM提取器和混合提取器的功能
 """
 
+import io
 import sys
 import os
+import threading
+import unicodedata
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import pytest
+
+# 被测模块提升到模块顶部一次性导入：sys.modules缓存生效后，
+# 各测试不再逐次走importlib查找
+from core.extractors import InvoiceInfo, RegexFallbackExtractor
+from core.extractors.hybrid_extractor import HybridExtractor
+from core.llm import get_llm
+
+# SKIP_LLM_PROBE=1 时跳过适配器可用性探测：该探测是对本地Ollama的
+# HTTP请求，服务未运行时要等完整的连接超时，CI上省掉这轮往返
+_SKIP_PROBE = os.environ.get("SKIP_LLM_PROBE") == "1"
+
+
+@contextlib.contextmanager
+def _buffered_print():
+    """把块内的print输出缓冲进StringIO，退出时一次性写回stdout
+
+    各测试有6-10次print，行缓冲下每次都触发一次flush系统调用；
+    缓冲后合并为一次write，测试本体耗时不再被stdio刷新淹没。
+    """
+    buf = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buf):
+            yield
+    finally:
+        sys.stdout.write(buf.getvalue())
+
+
+class _ThreadLocalStdout:
+    """按线程分流写入的stdout代理
+
+    并发跑测试时每个工作线程的print写进各自的StringIO，
+    主线程再按提交顺序统一写出，输出块之间不会互相穿插。
+    """
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def capture(self, test_func):
+        """在当前线程缓冲执行test_func，返回其全部输出"""
+        buf = self._local.buf = io.StringIO()
+        try:
+            test_func()
+        finally:
+            self._local.buf = None
+        return buf.getvalue()
+
+    def write(self, s):
+        buf = getattr(self._local, "buf", None)
+        (buf if buf is not None else self._fallback).write(s)
+
+    def flush(self):
+        pass
+
+# 正则兜底测试用的样本发票文本（模块导入时构建一次，
+# 并预先算好NFKC归一化形式，重复跑测试时不再逐次归一化）
+_FIXTURE_TEXT = """
+增值税电子普通发票
+
+发票号码：24421000123456789012
+
+购买方名称：北京测试科技有限公司
+纳税人识别号：91110000MA1A2B3C4D
+
+销售方名称：上海供应商有限公司
+纳税人识别号：91310000MA5E6F7G8H
+
+价税合计：￥12,345.67
+"""
+_FIXTURE_TEXT_NFKC = unicodedata.normalize("NFKC", _FIXTURE_TEXT)
+
+# 混合提取器单趟扫描测试用的样本文本（模块导入时构建一次）
+_SCAN_TEXT = (
+    "发票号码：24421000123456789012\n"
+    "纳税人识别号：91110000MA1A2B3C4D\n"
+    "纳税人识别号：91310000MA5E6F7G8H\n"
+    "价税合计￥12345.67\n"
+)
+
 
 def test_regex_fallback():
     """测试正则兜底提取器"""
     print("\n[测试] 正则兜底提取器")
     print("-" * 40)
     
-    from core.extractors import RegexFallbackExtractor
-    
-    test_text = """
-    增值税电子普通发票
-    
-    发票号码：24421000123456789012
-    
-    购买方名称：北京测试科技有限公司
-    纳税人识别号：91110000MA1A2B3C4D
-    
-    销售方名称：上海供应商有限公司
-    纳税人识别号：91310000MA5E6F7G8H
-    
-    价税合计：￥12,345.67
-    """
-    
     extractor = RegexFallbackExtractor()
-    info = extractor.extract(test_text)
-    
+    info = extractor.extract(_FIXTURE_TEXT)
+
+    # 预归一化的文本走同一条提取路径，结果须与原始全角文本一致
+    assert extractor.extract(_FIXTURE_TEXT_NFKC).to_dict() == info.to_dict()
+
     print(f"发票号码: {info.发票号码}")
     print(f"购买方名称: {info.购买方名称}")
     print(f"购买方税号: {info.购买方纳税人识别号}")
@@ -54,19 +126,24 @@ def test_llm_adapters():
     print("\n[测试] LLM适配器初始化")
     print("-" * 40)
     
-    from core.llm import LLMFactory
-    
+    # get_llm按(provider, model)做进程级单例缓存：重复调用命中字典，
+    # 不会反复构建HTTP客户端，大型测试会话下只有首次真正创建适配器
+
     # 测试Ollama适配器
     try:
-        adapter = LLMFactory.create("ollama", "qwen2.5:7b")
+        adapter = get_llm("ollama", "qwen2.5:7b")
+        assert get_llm("ollama", "qwen2.5:7b") is adapter  # 缓存命中返回同一实例
         print(f"✓ Ollama适配器创建成功: {adapter.model_name}")
-        print(f"  可用性: {adapter.is_available()}")
+        if _SKIP_PROBE:
+            print("  可用性: 跳过探测 (SKIP_LLM_PROBE=1)")
+        else:
+            print(f"  可用性: {adapter.is_available()}")
     except Exception as e:
         print(f"✗ Ollama适配器创建失败: {e}")
-    
+
     # 测试Gemini适配器
     try:
-        adapter = LLMFactory.create("gemini")
+        adapter = get_llm("gemini")
         print(f"✓ Gemini适配器创建成功: {adapter.model_name}")
         # 不检查可用性，因为可能没有API Key
     except Exception as e:
@@ -80,17 +157,16 @@ def test_hybrid_extractor_validation():
     print("\n[测试] 混合提取器验证功能")
     print("-" * 40)
     
-    from core.extractors.hybrid_extractor import HybridExtractor
-    
     # 创建一个使用正则兜底的混合提取器（不需要LLM）
     extractor = HybridExtractor.__new__(HybridExtractor)
-    extractor._patterns = {
-        'invoice_number_20': __import__('re').compile(r'\b(24[4-8]\d{17})\b'),
-        'invoice_number_8': __import__('re').compile(r'发票号码[：:]\s*(\d{8})'),
-        'tax_id': __import__('re').compile(r'\b([0-9A-HJ-NPQRTUWXY]{2}[0-9]{6}[0-9A-HJ-NPQRTUWXY]{10})\b'),
-        'amount': __import__('re').compile(r'[价合][税计][：:￥¥]?\s*(\d+\.?\d*)'),
-    }
-    
+
+    # 测试融合正则的单趟扫描（四个模式一次finditer完成）
+    scanned = extractor._scan_fields(_SCAN_TEXT)
+    assert scanned['invoice_number'] == "24421000123456789012"
+    assert scanned['tax_ids'] == ["91110000MA1A2B3C4D", "91310000MA5E6F7G8H"]
+    assert scanned['amounts'] == ["12345.67"]
+    print("✓ 融合正则单趟扫描正确")
+
     # 测试发票号码验证
     assert extractor._validate_invoice_number("24421000123456789012") == True
     assert extractor._validate_invoice_number("12345678") == True
@@ -116,8 +192,6 @@ def test_invoice_info_dataclass():
     print("\n[测试] InvoiceInfo数据类")
     print("-" * 40)
     
-    from core.extractors import InvoiceInfo
-    
     # 创建完整的发票信息
     info = InvoiceInfo(
         发票号码="24421000123456789012",
@@ -149,33 +223,50 @@ def test_invoice_info_dataclass():
 
 
 def run_all_tests():
-    """运行所有测试"""
-    print("=" * 50)
-    print("发票管理系统 V2 - 单元测试")
-    print("=" * 50)
-    
-    try:
-        test_invoice_info_dataclass()
-        test_regex_fallback()
-        test_llm_adapters()
-        test_hybrid_extractor_validation()
-        
-        print("\n" + "=" * 50)
-        print("所有测试通过! ✓")
+    """运行所有测试（输出整体缓冲，结束时一次性写出）
+
+    四个测试相互独立、不共享状态，用线程池并发执行：LLM适配器
+    测试的可用性探测是阻塞网络I/O，与其余CPU型测试重叠后总耗时
+    接近最慢单项而非各项之和。
+    """
+    with _buffered_print():
         print("=" * 50)
-        
-    except AssertionError as e:
-        print(f"\n✗ 测试失败: {e}")
-        return False
-    except Exception as e:
-        print(f"\n✗ 测试出错: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-    
+        print("发票管理系统 V2 - 单元测试")
+        print("=" * 50)
+
+        try:
+            proxy = _ThreadLocalStdout(sys.stdout)
+            with contextlib.redirect_stdout(proxy):
+                with ThreadPoolExecutor(max_workers=4) as pool:
+                    futures = [
+                        pool.submit(proxy.capture, test)
+                        for test in (
+                            test_invoice_info_dataclass,
+                            test_regex_fallback,
+                            test_llm_adapters,
+                            test_hybrid_extractor_validation,
+                        )
+                    ]
+                    # 按提交顺序回收结果，输出顺序与原串行执行一致
+                    for future in futures:
+                        proxy.write(future.result())
+
+            print("\n" + "=" * 50)
+            print("所有测试通过! ✓")
+            print("=" * 50)
+
+        except AssertionError as e:
+            print(f"\n✗ 测试失败: {e}")
+            return False
+        except Exception as e:
+            print(f"\n✗ 测试出错: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
     return True
 
 
 if __name__ == "__main__":
-    success = run_all_tests()
-    sys.exit(0 if success else 1)
+    # 直接执行时也走pytest：复用其断言改写、用例级缓存与失败定位
+    sys.exit(pytest.main([__file__, "-q"]))